@@ -1,7 +1,64 @@
 import { Request, Response } from 'express';
 import { Database } from 'sqlite'; // Import Database type from sqlite
 import { RecordEntry } from '../types/item.types'; // Assuming this type matches your table
-import { Buffer } from 'buffer'; // For handling BLOB data
+import {
+    GROUP_COMMIT_DEFAULT,
+    eachRecordById,
+    eachRecordInRange,
+    getRecord,
+    upsertRecord,
+    upsertRecordGrouped,
+    upsertRecords,
+    withWriteLock
+} from '../services/database.service';
+import { recordCache } from '../services/cache.service';
+
+const MULTI_GET_MAX_IDS = Number(process.env.MULTI_GET_MAX_IDS || 1000);
+const RANGE_DEFAULT_LIMIT = 100;
+const RANGE_MAX_LIMIT = Number(process.env.RANGE_MAX_LIMIT || 5000);
+const NDJSON_FLUSH_BYTES = 64 * 1024;
+
+// Streams one JSON document per line, coalescing lines into ~64 KiB writes.
+// Nothing is sent until the first flush, so an early error can still become a 500.
+class NdjsonStream {
+    private buffer = '';
+
+    constructor(private res: Response) {}
+
+    write(line: string) {
+        this.buffer += line + '\n';
+        if (this.buffer.length >= NDJSON_FLUSH_BYTES) {
+            this.flush();
+        }
+    }
+
+    end() {
+        this.flush();
+        this.res.end();
+    }
+
+    fail(error: Error, message: string) {
+        console.error(`${message}:`, error);
+        if (this.res.headersSent) {
+            this.res.destroy(error);
+        } else {
+            this.res.status(500).json({ message, error: error.message });
+        }
+    }
+
+    private flush() {
+        if (!this.res.headersSent) {
+            this.res.status(200).type('application/x-ndjson');
+        }
+        if (this.buffer) {
+            this.res.write(this.buffer);
+            this.buffer = '';
+        }
+    }
+}
+
+const optionalInt = (value: unknown): number | undefined =>
+    value === undefined ? undefined : Number(value);
 
 export class RecordController {
     private db: Database;
@@ -19,24 +76,22 @@ export class RecordController {
         }
 
         try {
-            // Convert notes to Buffer if it's a string (example for BLOB)
-            const notesBuffer = notes ? (typeof notes === 'string' ? Buffer.from(notes, 'utf-8') : notes) : null;
-
-            // Try to insert, but if user_id exists, update the record instead
-            const result = await this.db.run(
-                `INSERT INTO records (user_id, timestamp, heart_rate, blood_pressure, notes)
-                 VALUES (?, ?, ?, ?, ?)
-                 ON CONFLICT(user_id) DO UPDATE SET
-                    timestamp=excluded.timestamp,
-                    heart_rate=excluded.heart_rate,
-                    blood_pressure=excluded.blood_pressure,
-                    notes=excluded.notes`,
-                user_id,
-                timestamp,
-                heart_rate,
-                blood_pressure,
-                notesBuffer
-            );
+            // X-Group-Commit: on|off overrides the server default per request, so
+            // the two modes can be compared against one running server
+            const mode = req.get('X-Group-Commit');
+            const grouped = mode ? mode === 'on' : GROUP_COMMIT_DEFAULT;
+            const record = { user_id, timestamp, heart_rate, blood_pressure, notes } as RecordEntry;
+
+            // Insert, or update the record if user_id already exists
+            try {
+                if (grouped) {
+                    await upsertRecordGrouped(this.db, record);
+                } else {
+                    await upsertRecord(this.db, record);
+                }
+            } finally {
+                recordCache.invalidate([user_id]);
+            }
             res.status(201).json({ message: 'Record inserted or updated successfully', userId: user_id });
         } catch (error) {
             console.error('Error inserting/updating record:', error);
@@ -46,14 +101,19 @@ export class RecordController {
 
     async getRecordByUserId(req: Request, res: Response) {
         const { user_id } = req.params;
+        const cached = recordCache.get(user_id);
+        if (cached !== undefined) {
+            return res.status(200).type('json').send(cached);
+        }
+        const token = recordCache.beginRead();
+        let body: string | undefined;
         try {
-            const record: RecordEntry | undefined = await this.db.get(
-                'SELECT user_id, timestamp, heart_rate, blood_pressure, notes FROM records WHERE user_id = ?',
-                user_id
-            );
+            const record: RecordEntry | undefined = await getRecord(user_id);
+            // Serialize once; the same string is sent now and cached for later hits
+            body = record ? JSON.stringify(record) : undefined;
 
-            if (record) {
-                res.status(200).json(record);
+            if (body !== undefined) {
+                res.status(200).type('json').send(body);
             } else {
                 res.status(404).json({ message: 'Record not found' });
             }
@@ -61,41 +121,82 @@ export class RecordController {
             console.error('Error retrieving record:', error);
             const err = error as Error;
             res.status(500).json({ message: 'Error retrieving record', error: err.message });
+        } finally {
+            recordCache.endRead(token, user_id, body);
+        }
+    }
+
+    async getRecordsByIds(req: Request, res: Response) {
+        const { user_ids } = (req.body || {}) as { user_ids?: unknown };
+        if (!Array.isArray(user_ids) || user_ids.length === 0 || user_ids.length > MULTI_GET_MAX_IDS
+            || !user_ids.every(id => typeof id === 'string')) {
+            return res.status(400).json({ message: `Request body must be {"user_ids": [...]} with 1 to ${MULTI_GET_MAX_IDS} string ids.` });
+        }
+        // Cached records are sent straight away; the rest come from one IN (...) query per chunk
+        const stream = new NdjsonStream(res);
+        const misses: string[] = [];
+        for (const userId of user_ids as string[]) {
+            const cached = recordCache.get(userId);
+            if (cached !== undefined) {
+                stream.write(cached);
+            } else {
+                misses.push(userId);
+            }
+        }
+        try {
+            if (misses.length) {
+                await eachRecordById(misses, record => stream.write(JSON.stringify(record)));
+            }
+            stream.end();
+        } catch (error) {
+            stream.fail(error as Error, 'Error retrieving records');
         }
     }
 
+    async getRecordsInRange(req: Request, res: Response) {
+        const from = optionalInt(req.query.from) ?? 0;
+        const to = optionalInt(req.query.to) ?? Number.MAX_SAFE_INTEGER;
+        const limit = Math.min(optionalInt(req.query.limit) ?? RANGE_DEFAULT_LIMIT, RANGE_MAX_LIMIT);
+        const afterTimestamp = optionalInt(req.query.after_timestamp);
+        const afterUserId = req.query.after_user_id === undefined ? undefined : String(req.query.after_user_id);
+        if (![from, to, limit].every(Number.isInteger) || limit < 1
+            || (afterTimestamp !== undefined && !Number.isInteger(afterTimestamp))
+            || (afterTimestamp === undefined) !== (afterUserId === undefined)) {
+            return res.status(400).json({
+                message: 'Query must be ?from=&to=&limit= with integer values, plus after_timestamp and after_user_id together to page'
+            });
+        }
+        // Keyset pagination: pass the last record's timestamp and user_id as
+        // after_timestamp/after_user_id; a page shorter than limit is the last one
+        const stream = new NdjsonStream(res);
+        try {
+            await eachRecordInRange({ from, to, limit, afterTimestamp, afterUserId }, record => stream.write(JSON.stringify(record)));
+            stream.end();
+        } catch (error) {
+            stream.fail(error as Error, 'Error querying records');
+        }
+    }
+
+    getCacheStats(req: Request, res: Response) {
+        res.status(200).json(recordCache.stats());
+    }
+
     async insertRecordsBatch(req: Request, res: Response) {
         const records = req.body as RecordEntry[];
         if (!Array.isArray(records) || records.length === 0) {
             return res.status(400).json({ message: 'Request body must be a non-empty array of records.' });
         }
-        const db = this.db;
-        let transactionStarted = false;
         try {
-            await db.run('BEGIN TRANSACTION');
-            transactionStarted = true;
-            for (const record of records) {
-                const { user_id, timestamp, heart_rate, blood_pressure, notes } = record;
-                const notesBuffer = notes ? (typeof notes === 'string' ? Buffer.from(notes, 'utf-8') : notes) : null;
-                await db.run(
-                    'INSERT INTO records (user_id, timestamp, heart_rate, blood_pressure, notes) VALUES (?, ?, ?, ?, ?)',
-                    user_id, timestamp, heart_rate, blood_pressure, notesBuffer
-                );
+            // Upsert so reruns of an initial load overwrite rather than conflict
+            try {
+                await withWriteLock(() => upsertRecords(this.db, records));
+            } finally {
+                recordCache.invalidate(records.map(record => record.user_id));
             }
-            await db.run('COMMIT');
             res.status(201).json({ message: 'Batch insert successful', count: records.length });
         } catch (error) {
-            if (transactionStarted) {
-                try {
-                    await db.run('ROLLBACK');
-                } catch (rollbackError) {
-                    console.error('Error during ROLLBACK:', rollbackError);
-                }
-            }
-            const err = error as Error & { code?: string };
-            if (err.code === 'SQLITE_CONSTRAINT' && err.message.includes('UNIQUE constraint failed: records.user_id')) {
-                return res.status(409).json({ message: 'Conflict: One or more user_ids already exist.' });
-            }
+            const err = error as Error;
+            console.error('Error inserting/updating batch:', err);
             res.status(500).json({ message: 'Batch insert failed', error: err.message });
         }
     }
@@ -0,0 +1,147 @@
+import { Buffer } from 'buffer';
+
+// Bounded LRU cache of serialized GET /records/:user_id responses, so hot
+// records are not re-read and re-decrypted from SQLCipher on every request.
+// RECORD_CACHE_ENTRIES=0 disables it.
+const RECORD_CACHE_ENTRIES = Number(process.env.RECORD_CACHE_ENTRIES ?? 10000);
+const RECORD_CACHE_BYTES = Number(process.env.RECORD_CACHE_MB ?? 64) * 1024 * 1024;
+
+export interface CacheStats {
+    hits: number;
+    misses: number;
+    evictions: number;
+    invalidations: number;
+    entries: number;
+    bytes: number;
+    max_entries: number;
+    max_bytes: number;
+}
+
+interface CacheEntry {
+    body: string;
+    bytes: number;
+}
+
+export class RecordCache {
+    // Map iteration order is insertion order, so the first key is the least recently used
+    private entries = new Map<string, CacheEntry>();
+    private bytes = 0;
+    private hits = 0;
+    private misses = 0;
+    private evictions = 0;
+    private invalidations = 0;
+
+    // A read that started before a write to the same user_id must not cache what
+    // it read. Writes are numbered; recentWrites keeps the number of the last
+    // write per user_id for as long as any read older than it is still running.
+    private writeSeq = 0;
+    private recentWrites = new Map<string, number>();
+    private readsInFlight = new Map<number, number>();
+
+    constructor(private maxEntries: number, private maxBytes: number) {}
+
+    get enabled(): boolean {
+        return this.maxEntries > 0 && this.maxBytes > 0;
+    }
+
+    get(userId: string): string | undefined {
+        if (!this.enabled) {
+            return undefined;
+        }
+        const entry = this.entries.get(userId);
+        if (!entry) {
+            this.misses++;
+            return undefined;
+        }
+        this.hits++;
+        this.entries.delete(userId);
+        this.entries.set(userId, entry);
+        return entry.body;
+    }
+
+    // Call before reading a record from the database; pass the token to endRead
+    beginRead(): number {
+        const token = this.writeSeq;
+        this.readsInFlight.set(token, (this.readsInFlight.get(token) || 0) + 1);
+        return token;
+    }
+
+    // Cache body (if any) unless user_id was written since beginRead
+    endRead(token: number, userId: string, body: string | undefined): void {
+        const lastWrite = this.recentWrites.get(userId);
+        if (this.enabled && body !== undefined && (lastWrite === undefined || lastWrite <= token)) {
+            this.put(userId, body);
+        }
+        const remaining = (this.readsInFlight.get(token) || 1) - 1;
+        if (remaining) {
+            this.readsInFlight.set(token, remaining);
+        } else {
+            this.readsInFlight.delete(token);
+            this.pruneWrites();
+        }
+    }
+
+    // Drop user_ids written by a commit; call once the commit has finished
+    invalidate(userIds: Iterable<string>): void {
+        for (const userId of userIds) {
+            this.writeSeq++;
+            if (this.readsInFlight.size) {
+                this.recentWrites.delete(userId);
+                this.recentWrites.set(userId, this.writeSeq);
+            }
+            const entry = this.entries.get(userId);
+            if (entry) {
+                this.entries.delete(userId);
+                this.bytes -= entry.bytes;
+                this.invalidations++;
+            }
+        }
+    }
+
+    stats(): CacheStats {
+        return {
+            hits: this.hits,
+            misses: this.misses,
+            evictions: this.evictions,
+            invalidations: this.invalidations,
+            entries: this.entries.size,
+            bytes: this.bytes,
+            max_entries: this.maxEntries,
+            max_bytes: this.maxBytes
+        };
+    }
+
+    private put(userId: string, body: string): void {
+        const bytes = Buffer.byteLength(body);
+        const existing = this.entries.get(userId);
+        if (existing) {
+            this.entries.delete(userId);
+            this.bytes -= existing.bytes;
+        }
+        this.entries.set(userId, { body, bytes });
+        this.bytes += bytes;
+        while (this.entries.size > this.maxEntries || this.bytes > this.maxBytes) {
+            const [oldestId, oldest] = this.entries.entries().next().value as [string, CacheEntry];
+            this.entries.delete(oldestId);
+            this.bytes -= oldest.bytes;
+            this.evictions++;
+        }
+    }
+
+    // Forget writes that no running read started before
+    private pruneWrites(): void {
+        if (this.readsInFlight.size === 0) {
+            this.recentWrites.clear();
+            return;
+        }
+        const oldestRead = this.readsInFlight.keys().next().value as number;
+        for (const [userId, seq] of this.recentWrites) {
+            if (seq > oldestRead) {
+                break;
+            }
+            this.recentWrites.delete(userId);
+        }
+    }
+}
+
+export const recordCache = new RecordCache(RECORD_CACHE_ENTRIES, RECORD_CACHE_BYTES);
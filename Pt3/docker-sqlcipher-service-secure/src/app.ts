@@ -9,7 +9,8 @@ import { initDb } from './services/database.service'; // getDb is a function, no
 const app = express();
 const PORT = process.env.PORT || 3000;
 
-app.use(bodyParser.json());
+// Batched writes POST arrays of records, which outgrow the 100kb default
+app.use(bodyParser.json({ limit: process.env.BODY_LIMIT || '16mb' }));
 
 // initDb() resolves with the Database instance from the 'sqlite' library
 initDb().then((dbInstance: Database) => { // Correctly type the resolved value
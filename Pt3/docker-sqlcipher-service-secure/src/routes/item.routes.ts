@@ -14,6 +14,15 @@ export function setRecordRoutes(app: Application, recordController: RecordContro
         }
     });
 
+    // POST endpoint to retrieve many records by user_id, streamed as NDJSON
+    app.post('/records/multi-get', recordController.getRecordsByIds.bind(recordController));
+
+    // GET endpoint to page through records by timestamp range, streamed as NDJSON
+    app.get('/records', recordController.getRecordsInRange.bind(recordController));
+
     // GET endpoint to retrieve a record by its user_id
     app.get('/records/:user_id', recordController.getRecordByUserId.bind(recordController));
+
+    // GET endpoint for the record cache's hit/miss/eviction counters
+    app.get('/stats/cache', recordController.getCacheStats.bind(recordController));
 }
\ No newline at end of file
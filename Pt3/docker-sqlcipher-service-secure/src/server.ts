@@ -1 +1,7 @@
+// Each read-pool connection runs its queries on the libuv threadpool (4 threads
+// by default); size it before anything uses it so the pool can read in parallel
+if (!process.env.UV_THREADPOOL_SIZE) {
+    process.env.UV_THREADPOOL_SIZE = String(Math.max(4, Number(process.env.READ_POOL_SIZE ?? 4) + 2));
+}
+
 import './app';
\ No newline at end of file
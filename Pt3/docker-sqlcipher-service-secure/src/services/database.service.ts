@@ -1,26 +1,73 @@
 import sqlite3 from 'sqlite3';
-import { open, Database } from 'sqlite';
+import { open, Database, Statement } from 'sqlite';
+import { Buffer } from 'buffer';
+import { RecordEntry } from '../types/item.types';
 
 const DB_FILE = process.env.DB_FILE || 'secure.db';
 const DB_KEY = process.env.DB_KEY; // IMPORTANT: Use a strong, unique key and manage it securely
 
 let db: Database;
 
-export const initDb = async (): Promise<Database> => {
-  if (db) {
-    return db;
-  }
+// Read-only connections for GET /records/:user_id. WAL lets them read while
+// the writer commits, so reads no longer queue behind writes on one handle.
+// READ_POOL_SIZE=0 serves reads from the writer connection.
+export const READ_POOL_SIZE = Number(process.env.READ_POOL_SIZE ?? 4);
+const SELECT_RECORD_SQL = 'SELECT user_id, timestamp, heart_rate, blood_pressure, notes FROM records WHERE user_id = ?';
+
+interface Reader {
+  database: Database;
+  select: Statement;
+  inFlight: number;
+}
+
+const readers: Reader[] = [];
+let writerSelect: Statement;
+
+// Rows per multi-row upsert statement. 5 bound parameters per row keeps each
+// statement well under SQLite's host parameter limit.
+const UPSERT_BATCH_ROWS = 100;
+const upsertStatements = new Map<number, Statement>();
+let writeQueue: Promise<unknown> = Promise.resolve();
 
+// Group commit for single-record writes: records arriving within
+// GROUP_COMMIT_WINDOW_MS of the first queued one (or until GROUP_COMMIT_MAX_RECORDS
+// are queued) are upserted in one transaction, so they share one WAL commit.
+// Off by default, since a grouped write is only acknowledged once its group
+// commits; GROUP_COMMIT=on makes it the default, and X-Group-Commit overrides
+// it per request.
+export const GROUP_COMMIT_DEFAULT = process.env.GROUP_COMMIT === 'on';
+const GROUP_COMMIT_WINDOW_MS = Number(process.env.GROUP_COMMIT_WINDOW_MS ?? 2);
+const GROUP_COMMIT_MAX_RECORDS = Number(process.env.GROUP_COMMIT_MAX_RECORDS || UPSERT_BATCH_ROWS);
+
+interface PendingWrite {
+  record: RecordEntry;
+  resolve: () => void;
+  reject: (error: Error) => void;
+}
+
+let pendingWrites: PendingWrite[] = [];
+let flushTimer: NodeJS.Timeout | null = null;
+
+// Open a connection to the database file and set the encryption key
+const openKeyed = async (mode?: number): Promise<Database> => {
   // Use the custom SQLCipher-enabled sqlite3
   const sqlcipher = sqlite3.verbose();
 
-  db = await open({
+  const database = await open({
     filename: `./${DB_FILE}`,
-    driver: sqlcipher.Database
+    driver: sqlcipher.Database,
+    mode
   });
+  await database.run(`PRAGMA key = '${DB_KEY}';`);
+  return database;
+};
+
+export const initDb = async (): Promise<Database> => {
+  if (db) {
+    return db;
+  }
 
-  // Set the encryption key
-  await db.run(`PRAGMA key = '${DB_KEY}';`);
+  db = await openKeyed();
   await db.run('PRAGMA journal_mode = WAL;');
   // Test the key (optional, but good for verification)
   await db.run('PRAGMA cipher_version;');
@@ -38,6 +85,16 @@ export const initDb = async (): Promise<Database> => {
     );
   `);
   console.log('Table "records" ensured.');
+  // Backs the timestamp range query; user_id breaks ties for keyset pagination
+  await db.exec('CREATE INDEX IF NOT EXISTS records_timestamp ON records(timestamp, user_id);');
+
+  // Readers open after the writer so the file and table already exist
+  writerSelect = await db.prepare(SELECT_RECORD_SQL);
+  for (let i = 0; i < READ_POOL_SIZE; i++) {
+    const database = await openKeyed(sqlite3.OPEN_READONLY);
+    readers.push({ database, select: await database.prepare(SELECT_RECORD_SQL), inFlight: 0 });
+  }
+  console.log(`Read pool of ${readers.length} connections opened.`);
 
   return db;
 };
@@ -47,4 +104,200 @@ export const getDb = (): Database => {
     throw new Error('Database not initialized. Call initDb first.');
   }
   return db;
-};
\ No newline at end of file
+};
+
+// Run fn on the least busy reader (or the writer when there is no pool)
+const withReader = async <T>(fn: (database: Database, select: Statement) => Promise<T>): Promise<T> => {
+  if (readers.length === 0) {
+    return fn(db, writerSelect);
+  }
+  let reader = readers[0];
+  for (const candidate of readers) {
+    if (candidate.inFlight < reader.inFlight) {
+      reader = candidate;
+    }
+  }
+  reader.inFlight++;
+  try {
+    return await fn(reader.database, reader.select);
+  } finally {
+    reader.inFlight--;
+  }
+};
+
+// Look up one record. The cached statement is reset after each lookup: until
+// then it keeps its read transaction open, pinning a WAL snapshot so
+// checkpoints cannot reclaim the log.
+export const getRecord = (userId: string): Promise<RecordEntry | undefined> =>
+  withReader(async (database, select) => {
+    try {
+      return await select.get<RecordEntry>(userId);
+    } finally {
+      await select.reset();
+    }
+  });
+
+// user_ids per IN (...) query, under SQLite's default 999 host parameter limit
+const MULTI_GET_CHUNK = 500;
+
+// Call onRow for each of userIds that exists, in no particular order
+export const eachRecordById = (userIds: string[], onRow: (record: RecordEntry) => void): Promise<void> =>
+  withReader(async database => {
+    for (let i = 0; i < userIds.length; i += MULTI_GET_CHUNK) {
+      const chunk = userIds.slice(i, i + MULTI_GET_CHUNK);
+      await database.each<RecordEntry>(
+        `SELECT user_id, timestamp, heart_rate, blood_pressure, notes FROM records
+         WHERE user_id IN (${new Array(chunk.length).fill('?').join(', ')})`,
+        chunk,
+        (err: Error | null, record: RecordEntry) => {
+          if (!err) {
+            onRow(record);
+          }
+        }
+      );
+    }
+  });
+
+export interface RangeQuery {
+  from: number;
+  to: number;
+  limit: number;
+  // Keyset cursor: the timestamp and user_id of the last record of the previous page
+  afterTimestamp?: number;
+  afterUserId?: string;
+}
+
+// Call onRow for up to limit records with from <= timestamp < to, ordered by (timestamp, user_id)
+export const eachRecordInRange = (query: RangeQuery, onRow: (record: RecordEntry) => void): Promise<number> =>
+  withReader(database => {
+    const after = query.afterTimestamp !== undefined && query.afterUserId !== undefined;
+    return database.each<RecordEntry>(
+      `SELECT user_id, timestamp, heart_rate, blood_pressure, notes FROM records
+       WHERE timestamp >= ? AND timestamp < ?${after ? ' AND (timestamp, user_id) > (?, ?)' : ''}
+       ORDER BY timestamp, user_id
+       LIMIT ?`,
+      after
+        ? [query.from, query.to, query.afterTimestamp, query.afterUserId, query.limit]
+        : [query.from, query.to, query.limit],
+      (err: Error | null, record: RecordEntry) => {
+        if (!err) {
+          onRow(record);
+        }
+      }
+    );
+  });
+
+// Convert notes to Buffer if it's a string (stored as a BLOB)
+export const toNotesBuffer = (notes: RecordEntry['notes']): Buffer | null =>
+  notes ? (typeof notes === 'string' ? Buffer.from(notes, 'utf-8') : notes) : null;
+
+// Run fn once every previously queued write has finished, so transactions on the
+// shared connection never interleave
+export const withWriteLock = <T>(fn: () => Promise<T>): Promise<T> => {
+  const result = writeQueue.then(fn);
+  writeQueue = result.catch(() => undefined);
+  return result;
+};
+
+const getUpsertStatement = async (database: Database, rows: number): Promise<Statement> => {
+  let stmt = upsertStatements.get(rows);
+  if (!stmt) {
+    const placeholders = new Array(rows).fill('(?, ?, ?, ?, ?)').join(', ');
+    stmt = await database.prepare(
+      `INSERT INTO records (user_id, timestamp, heart_rate, blood_pressure, notes)
+       VALUES ${placeholders}
+       ON CONFLICT(user_id) DO UPDATE SET
+          timestamp=excluded.timestamp,
+          heart_rate=excluded.heart_rate,
+          blood_pressure=excluded.blood_pressure,
+          notes=excluded.notes`
+    );
+    upsertStatements.set(rows, stmt);
+  }
+  return stmt;
+};
+
+// Upsert records in one transaction using cached multi-row prepared statements.
+// Callers must hold the write lock.
+export const upsertRecords = async (database: Database, records: RecordEntry[]): Promise<void> => {
+  await database.run('BEGIN TRANSACTION');
+  try {
+    for (let i = 0; i < records.length; i += UPSERT_BATCH_ROWS) {
+      const chunk = records.slice(i, i + UPSERT_BATCH_ROWS);
+      const params: unknown[] = [];
+      for (const { user_id, timestamp, heart_rate, blood_pressure, notes } of chunk) {
+        params.push(user_id, timestamp, heart_rate, blood_pressure, toNotesBuffer(notes));
+      }
+      const stmt = await getUpsertStatement(database, chunk.length);
+      await stmt.run(...params);
+    }
+    await database.run('COMMIT');
+  } catch (error) {
+    try {
+      await database.run('ROLLBACK');
+    } catch (rollbackError) {
+      console.error('Error during ROLLBACK:', rollbackError);
+    }
+    throw error;
+  }
+};
+
+const upsertOne = (database: Database, record: RecordEntry): Promise<unknown> =>
+  database.run(
+    `INSERT INTO records (user_id, timestamp, heart_rate, blood_pressure, notes)
+     VALUES (?, ?, ?, ?, ?)
+     ON CONFLICT(user_id) DO UPDATE SET
+        timestamp=excluded.timestamp,
+        heart_rate=excluded.heart_rate,
+        blood_pressure=excluded.blood_pressure,
+        notes=excluded.notes`,
+    record.user_id,
+    record.timestamp,
+    record.heart_rate,
+    record.blood_pressure,
+    toNotesBuffer(record.notes)
+  );
+
+// Upsert a single record in its own autocommit statement.
+export const upsertRecord = (database: Database, record: RecordEntry): Promise<unknown> =>
+  withWriteLock(() => upsertOne(database, record));
+
+const flushPendingWrites = (database: Database): void => {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  const group = pendingWrites;
+  pendingWrites = [];
+  if (group.length === 0) {
+    return;
+  }
+  withWriteLock(async () => {
+    try {
+      await upsertRecords(database, group.map(({ record }) => record));
+      group.forEach(({ resolve }) => resolve());
+    } catch (error) {
+      // One bad record must not fail its neighbours: retry each on its own
+      for (const { record, resolve, reject } of group) {
+        try {
+          await upsertOne(database, record);
+          resolve();
+        } catch (recordError) {
+          reject(recordError as Error);
+        }
+      }
+    }
+  });
+};
+
+// Queue a record for the next group commit. Resolves once the transaction
+// holding it has committed.
+export const upsertRecordGrouped = (database: Database, record: RecordEntry): Promise<void> =>
+  new Promise<void>((resolve, reject) => {
+    pendingWrites.push({ record, resolve, reject });
+    if (pendingWrites.length >= GROUP_COMMIT_MAX_RECORDS) {
+      flushPendingWrites(database);
+    } else if (!flushTimer) {
+      flushTimer = setTimeout(() => flushPendingWrites(database), GROUP_COMMIT_WINDOW_MS);
+    }
+  });
@@ -38,7 +38,8 @@ curl -k -X POST https://35.188.66.105:8799/attestation/sgx/dcap/v1/report \
   -d "$(jq -n --arg quote "$(base64 -w 0 quote.dat)" '{isvQuote: $quote}')" \
   -o response.json \
   -w "%{http_code}\n"
-sudo docker run -d --name fithealth -p 3000:3000 -v /shared_timing:/shared_timing "$DOCKER_IMAGE"
+# READ_POOL_SIZE sets the number of read-only database connections (default 4)
+sudo docker run -d --name fithealth -p 3000:3000 -v /shared_timing:/shared_timing -e READ_POOL_SIZE="${READ_POOL_SIZE:-4}" "$DOCKER_IMAGE"
 
 # Set up certs (replace with your actual method, e.g., gsutil cp)
 sudo mkdir -p /etc/nginx/certs/
@@ -66,6 +67,9 @@ ssl_certificate_key       /etc/nginx/certs/server.key;
 ssl_protocols             TLSv1.2 TLSv1.3;
 ssl_prefer_server_ciphers on;
 
+# Batched initial loads POST JSON arrays larger than the 1m default
+client_max_body_size      16m;
+
 location / {
     proxy_pass         http://localhost:3000;
     proxy_set_header   Host \$host;
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Storage-layer microbenchmarks for the FitHealth records table, without HTTP,
+nginx or TLS in the way.
+
+Builds the schema from database.service.ts and replays the statements the
+server runs (single-record upsert, point select, multi-row batch upsert)
+directly against a local database file. Each pragma configuration gets a
+fresh file and runs these phases:
+
+  load          initial load in batched transactions, like POST /records with an array
+  upsert        autocommit single-record upserts, like POST /records
+  batch_upsert  --batch-size records per transaction through the multi-row statement
+  select_warm   point selects on the connection that just wrote the data
+  select_cold   point selects on a freshly opened connection (key derivation
+                and an empty page cache; the OS page cache stays warm)
+
+Uses SQLCipher (the sqlcipher3 or pysqlcipher3 package) when it is installed and
+plain sqlite3 otherwise; cipher pragmas are only swept with SQLCipher.
+
+Example:
+    python bench_storage.py --records 100000 --cache-size -2000 -64000 \\
+        --kdf-iter 4000 256000 --synchronous NORMAL FULL --out storage.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from latency_stats import LatencyHistogram
+
+try:
+    from sqlcipher3 import dbapi2 as sqlite
+    CIPHER = True
+except ImportError:
+    try:
+        from pysqlcipher3 import dbapi2 as sqlite
+        CIPHER = True
+    except ImportError:
+        import sqlite3 as sqlite
+        CIPHER = False
+
+# --- Statements from database.service.ts / record.controller.ts ---
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS records (
+      user_id TEXT NOT NULL,
+      timestamp INTEGER NOT NULL,
+      heart_rate INTEGER NOT NULL,
+      blood_pressure TEXT NOT NULL,
+      notes BLOB,
+      PRIMARY KEY(user_id)
+    );
+"""
+INDEX_SQL = "CREATE INDEX IF NOT EXISTS records_timestamp ON records(timestamp, user_id);"
+UPSERT_SQL = """INSERT INTO records (user_id, timestamp, heart_rate, blood_pressure, notes)
+                 VALUES (?, ?, ?, ?, ?)
+                 ON CONFLICT(user_id) DO UPDATE SET
+                    timestamp=excluded.timestamp,
+                    heart_rate=excluded.heart_rate,
+                    blood_pressure=excluded.blood_pressure,
+                    notes=excluded.notes"""
+SELECT_SQL = "SELECT user_id, timestamp, heart_rate, blood_pressure, notes FROM records WHERE user_id = ?"
+UPSERT_BATCH_ROWS = 100
+
+PHASES = ("load", "upsert", "batch_upsert", "select_warm", "select_cold")
+RESULT_FIELDS = ["config", "phase", "ops", "seconds", "ops_per_sec", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+
+def multi_upsert_sql(rows):
+    return UPSERT_SQL.replace("VALUES (?, ?, ?, ?, ?)", "VALUES " + ", ".join(["(?, ?, ?, ?, ?)"] * rows))
+
+
+def record_row(user_id):
+    """A row shaped like test_speed.py's generate_record_data after toNotesBuffer."""
+    return (
+        user_id,
+        int(time.time()) - random.randint(0, 86400 * 30),
+        random.randint(50, 120),
+        f"{random.randint(90, 140)}/{random.randint(60, 90)}",
+        os.urandom(10).hex().encode(),
+    )
+
+
+def open_db(path, config, key):
+    """Open a connection and apply config the way initDb does: key first, then the rest."""
+    start = time.perf_counter()
+    conn = sqlite.connect(path, isolation_level=None, check_same_thread=False)
+    if CIPHER:
+        conn.execute(f"PRAGMA key = '{key}';")
+        if config.get("cipher_page_size") is not None:
+            conn.execute(f"PRAGMA cipher_page_size = {config['cipher_page_size']};")
+        if config.get("kdf_iter") is not None:
+            conn.execute(f"PRAGMA kdf_iter = {config['kdf_iter']};")
+    conn.execute("PRAGMA journal_mode = WAL;")
+    for pragma in ("synchronous", "cache_size", "wal_autocheckpoint"):
+        if config.get(pragma) is not None:
+            conn.execute(f"PRAGMA {pragma} = {config[pragma]};")
+    # The first read derives the key and decrypts page 1, so count it as part of opening
+    conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+    return conn, (time.perf_counter() - start) * 1000
+
+
+def timed(hist, fn, *params):
+    start = time.perf_counter()
+    fn(*params)
+    hist.record((time.perf_counter() - start) * 1000)
+
+
+def run_config(args, config, workdir):
+    """
+    Run every phase for one pragma configuration. Returns {phase: (histogram,
+    seconds, records)} plus "open_ms", the cold open time.
+    """
+    path = os.path.join(workdir, "bench.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    results = {}
+    conn, _ = open_db(path, config, args.key)
+    conn.execute(SCHEMA_SQL)
+    conn.execute(INDEX_SQL)
+    user_ids = [f"user_{i + 1}" for i in range(args.records)]
+    multi_sql = multi_upsert_sql(UPSERT_BATCH_ROWS)
+
+    def upsert_rows(rows):
+        # upsertRecords: one transaction, full multi-row chunks plus a remainder
+        conn.execute("BEGIN TRANSACTION")
+        for i in range(0, len(rows), UPSERT_BATCH_ROWS):
+            chunk = rows[i:i + UPSERT_BATCH_ROWS]
+            sql = multi_sql if len(chunk) == UPSERT_BATCH_ROWS else multi_upsert_sql(len(chunk))
+            conn.execute(sql, [value for row in chunk for value in row])
+        conn.execute("COMMIT")
+
+    def phase(name, ops, fn, records=None):
+        hist = LatencyHistogram()
+        start = time.perf_counter()
+        for op in ops:
+            timed(hist, fn, op)
+        results[name] = (hist, time.perf_counter() - start, records if records is not None else len(ops))
+
+    # Initial load, --load-batch records per transaction; the histogram is per transaction
+    load_batches = [
+        [record_row(user_id) for user_id in user_ids[i:i + args.load_batch]]
+        for i in range(0, len(user_ids), args.load_batch)
+    ]
+    phase("load", load_batches, upsert_rows, records=args.records)
+
+    upsert = conn.cursor()
+    phase("upsert", [record_row(random.choice(user_ids)) for _ in range(args.ops)], lambda row: upsert.execute(UPSERT_SQL, row))
+    batches = [[record_row(random.choice(user_ids)) for _ in range(args.batch_size)] for _ in range(max(1, args.ops // args.batch_size))]
+    phase("batch_upsert", batches, upsert_rows, records=len(batches) * args.batch_size)
+
+    select = conn.cursor()
+    lookups = [random.choice(user_ids) for _ in range(args.ops)]
+    phase("select_warm", lookups, lambda user_id: select.execute(SELECT_SQL, (user_id,)).fetchone())
+    conn.close()
+
+    conn, cold_open_ms = open_db(path, config, args.key)
+    select = conn.cursor()
+    phase("select_cold", lookups, lambda user_id: select.execute(SELECT_SQL, (user_id,)).fetchone())
+    conn.close()
+    results["open_ms"] = cold_open_ms
+    return results
+
+
+def result_rows(name, results):
+    rows = []
+    for phase_name in PHASES:
+        # load and batch_upsert count records; their latencies are per transaction
+        hist, seconds, ops = results[phase_name]
+        rows.append({
+            "config": name,
+            "phase": phase_name,
+            "ops": ops,
+            "seconds": seconds,
+            "ops_per_sec": ops / seconds if seconds else 0.0,
+            "mean_ms": hist.mean,
+            "p50_ms": hist.percentile(50),
+            "p95_ms": hist.percentile(95),
+            "p99_ms": hist.percentile(99),
+            "max_ms": hist.max,
+        })
+    rows.append({"config": name, "phase": "open", "ops": 1, "seconds": results["open_ms"] / 1000,
+                 "ops_per_sec": 0.0, "mean_ms": results["open_ms"], "p50_ms": results["open_ms"],
+                 "p95_ms": results["open_ms"], "p99_ms": results["open_ms"], "max_ms": results["open_ms"]})
+    return rows
+
+
+def config_name(config):
+    return ",".join(f"{key}={value}" for key, value in config.items() if value is not None) or "defaults"
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the records table statements directly against SQLCipher/sqlite")
+    p.add_argument("--records", type=int, default=100000, help="Records in the initial load (default: 100000)")
+    p.add_argument("--ops", type=int, default=20000, help="Operations per upsert/select phase (default: 20000)")
+    p.add_argument("--load-batch", type=int, default=1000, help="Records per initial-load transaction (default: 1000)")
+    p.add_argument("--batch-size", type=int, default=100, help="Records per batch_upsert transaction (default: 100)")
+    p.add_argument("--key", default="benchmark-key", help="SQLCipher key (default: benchmark-key)")
+    p.add_argument("--cache-size", nargs="+", default=[None], help="PRAGMA cache_size values to sweep (negative = KiB)")
+    p.add_argument("--cipher-page-size", type=int, nargs="+", default=[None], help="PRAGMA cipher_page_size values to sweep (SQLCipher only)")
+    p.add_argument("--kdf-iter", type=int, nargs="+", default=[None], help="PRAGMA kdf_iter values to sweep (SQLCipher only)")
+    p.add_argument("--synchronous", nargs="+", default=[None], help="PRAGMA synchronous values to sweep, e.g. NORMAL FULL")
+    p.add_argument("--wal-autocheckpoint", type=int, nargs="+", default=[None], help="PRAGMA wal_autocheckpoint values to sweep")
+    p.add_argument("--dir", default=None, help="Directory for the database file (default: a temporary directory)")
+    p.add_argument("--seed", type=int, default=None, help="Random seed, for repeatable record data")
+    p.add_argument("--out", default=None, help="Write results to this CSV")
+    p.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = p.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    if CIPHER:
+        print(f"Using SQLCipher ({sqlite.__name__})")
+    else:
+        print("SQLCipher not installed; using plain sqlite3 and skipping cipher pragmas")
+        args.cipher_page_size = [None]
+        args.kdf_iter = [None]
+
+    sweep = {
+        "cache_size": args.cache_size,
+        "cipher_page_size": args.cipher_page_size,
+        "kdf_iter": args.kdf_iter,
+        "synchronous": args.synchronous,
+        "wal_autocheckpoint": args.wal_autocheckpoint,
+    }
+    configs = [dict(zip(sweep, values)) for values in itertools.product(*sweep.values())]
+
+    tmp = None
+    workdir = args.dir
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="bench_storage_")
+        workdir = tmp.name
+    rows = []
+    try:
+        for i, config in enumerate(configs, 1):
+            name = config_name(config)
+            print(f"\n=== [{i}/{len(configs)}] {name} ===")
+            config_rows = result_rows(name, run_config(args, config, workdir))
+            for row in config_rows:
+                print(f"  {row['phase']:<13} {row['ops']:>9} ops  {row['ops_per_sec']:>11.1f} ops/s  "
+                      f"p50 {row['p50_ms']:.3f}  p95 {row['p95_ms']:.3f}  p99 {row['p99_ms']:.3f} ms")
+            rows.extend(config_rows)
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nResults written to {args.out}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cipher": CIPHER, "records": args.records, "ops": args.ops, "configs": configs, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
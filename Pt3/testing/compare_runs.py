@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Compare two groups of runs (e.g. TDX vs non-TDX) with bootstrap confidence
+intervals on the difference of each metric, group B minus group A.
+
+Inputs per group, each a glob that can be repeated:
+  --latency NAME GLOB     test_speed.py --save-histograms JSON files, or per-request
+                          latencies in ms (.npy, or a CSV/text file with a latency_ms
+                          column or one value per line)
+  --stats NAME GLOB       container stats: raw docker stats dumps, parse_load_data.py
+                          CSVs or get_container_stats.py CSVs
+  --throughput NAME GLOB  benchmarkData.csv-style files ("Trial N,<ops/s>,..." rows);
+                          for a group that has them, these replace the throughput
+                          recorded in its --latency JSON files
+
+Latency percentiles and means use a two-level bootstrap: each replicate
+resamples the group's runs, then resamples requests from the pooled histogram
+of the runs it drew. Requests are resampled as a multinomial draw over
+histogram buckets, so the cost depends on the number of buckets, not the
+number of requests, and millions of samples per group take seconds.
+Throughput and CPU/memory are one value per run (a run's samples are
+autocorrelated, so they are not resampled individually) and are bootstrapped
+over runs. A difference is significant when its interval excludes zero.
+
+Example:
+    python compare_runs.py --latency base 'base_*.json' --latency tdx 'tdx_*.json' \\
+        --stats base '../data/*on_TDX_run_*.csv' --stats tdx '../data/TDX_run_*.csv'
+"""
+import argparse
+import csv
+import glob
+import json
+import numpy as np
+from latency_stats import BUCKET_COUNT, SUB_BUCKET_BITS, SUB_BUCKET_COUNT, MAX_TRACKABLE_US, LatencyStats, bucket_bounds
+from parse_load_data import load_run, summarize
+
+PERCENTILES = (50, 90, 95, 99)
+STATS_METRICS = (("cpu_mean_pct", "steady_cpu_mean"), ("cpu_p95_pct", "steady_cpu_p95"), ("mem_mean_mib", "steady_mem_mean_mib"))
+RESULT_FIELDS = ["metric", "a", "b", "diff", "diff_pct", "ci_low", "ci_high", "significant", "runs_a", "runs_b", "samples_a", "samples_b"]
+CHUNK_REPLICATES = 500
+
+# Midpoint (ms) of every histogram bucket, the value LatencyHistogram.percentile reports
+BUCKET_MID_MS = np.array([sum(bucket_bounds(i)) / 2 / 1000 for i in range(BUCKET_COUNT)])
+
+
+# --- Loading ---
+def bucket_indices(latency_ms):
+    """Vectorized latency_stats._bucket_index over an array of latencies in ms."""
+    value_us = np.clip((np.asarray(latency_ms, dtype=np.float64) * 1000).astype(np.int64), 0, MAX_TRACKABLE_US)
+    # frexp's exponent is the bit length of a positive integer
+    shift = np.maximum(np.frexp(value_us.astype(np.float64))[1] - SUB_BUCKET_BITS, 0)
+    return np.where(value_us < SUB_BUCKET_COUNT, value_us, (shift << (SUB_BUCKET_BITS - 1)) + (value_us >> shift))
+
+
+def read_latencies(path):
+    """Per-request latencies (ms) and their op types (None if the file has none)."""
+    if path.endswith(".npy"):
+        return np.load(path), None
+    with open(path) as f:
+        first = f.readline()
+    header = [name.strip() for name in first.split(",")]
+    if "latency_ms" not in header:
+        return np.loadtxt(path, dtype=np.float64, ndmin=1), None
+    latencies = np.loadtxt(path, delimiter=",", skiprows=1, usecols=header.index("latency_ms"), dtype=np.float64, ndmin=1)
+    ops = None
+    if "op_type" in header:
+        ops = np.loadtxt(path, delimiter=",", skiprows=1, usecols=header.index("op_type"), dtype=str, ndmin=1)
+    return latencies, ops
+
+
+def load_latency_run(path, ops):
+    """
+    One run's latency histograms as {op_type: dense bucket counts}, plus its
+    mixed-workload throughput when the file records it.
+    """
+    if path.endswith(".json"):
+        stats, meta = LatencyStats.load(path)
+        counts = {op: np.array(stats.histogram([op]).counts, dtype=np.int64) for op in ops if op in stats.op_types()}
+        throughput = meta["mixed_ops"] / meta["mixed_duration"] if meta.get("mixed_duration") else None
+        return counts, throughput
+    latencies, op_types = read_latencies(path)
+    if op_types is None:
+        # Without op types the requests can only be compared as a whole
+        return {"all": np.bincount(bucket_indices(latencies), minlength=BUCKET_COUNT)}, None
+    return {
+        op: np.bincount(bucket_indices(latencies[op_types == op]), minlength=BUCKET_COUNT)
+        for op in ops if (op_types == op).any()
+    }, None
+
+
+def load_trial_throughputs(path):
+    """Mixed throughput per trial from a benchmarkData.csv-style file."""
+    values = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if row and row[0].strip().lower().startswith("trial") and len(row) > 1 and row[1].strip():
+                values.append(float(row[1]))
+    return values
+
+
+# --- Bootstrap ---
+def histogram_stats(counts, pcts):
+    """Mean and percentiles (ms) of each row of a (replicates, buckets) count matrix."""
+    n = counts.sum(axis=1)
+    cum = np.cumsum(counts, axis=1)
+    stats = {"mean_ms": counts @ BUCKET_MID_MS[:counts.shape[1]] / np.maximum(n, 1)}
+    for pct in pcts:
+        target = np.maximum(1, np.ceil(n * pct / 100))
+        stats[f"p{pct}_ms"] = BUCKET_MID_MS[(cum >= target[:, None]).argmax(axis=1)]
+    return stats
+
+
+def resample_histograms(runs, replicates, rng):
+    """
+    (replicates, buckets) counts: resample runs with replacement, then draw as
+    many requests as the chosen runs hold from their pooled histogram.
+    """
+    picks = rng.integers(0, len(runs), size=(replicates, len(runs)))
+    weights = np.zeros((replicates, len(runs)))
+    np.add.at(weights, (np.arange(replicates)[:, None], picks), 1)
+    pooled = weights @ runs
+    n = pooled.sum(axis=1)
+    return rng.multinomial(n.astype(np.int64), pooled / n[:, None])
+
+
+def bootstrap_latency(runs_a, runs_b, pcts, replicates, rng):
+    """{statistic: (value A, value B, replicate differences B - A)} for two lists of run histograms."""
+    runs_a, runs_b = np.array(runs_a, dtype=np.float64), np.array(runs_b, dtype=np.float64)
+    # Only buckets either group used; the rest are zero in every replicate
+    used = np.flatnonzero(runs_a.sum(axis=0) + runs_b.sum(axis=0))
+    last = used[-1] + 1 if len(used) else 1
+    runs_a, runs_b = runs_a[:, :last], runs_b[:, :last]
+    point_a = histogram_stats(runs_a.sum(axis=0, keepdims=True), pcts)
+    point_b = histogram_stats(runs_b.sum(axis=0, keepdims=True), pcts)
+    diffs = {name: [] for name in point_a}
+    for start in range(0, replicates, CHUNK_REPLICATES):
+        size = min(CHUNK_REPLICATES, replicates - start)
+        stats_a = histogram_stats(resample_histograms(runs_a, size, rng), pcts)
+        stats_b = histogram_stats(resample_histograms(runs_b, size, rng), pcts)
+        for name in diffs:
+            diffs[name].append(stats_b[name] - stats_a[name])
+    return {name: (float(point_a[name][0]), float(point_b[name][0]), np.concatenate(diffs[name])) for name in diffs}
+
+
+def bootstrap_run_means(values_a, values_b, replicates, rng):
+    """Difference of per-run means, B - A; no replicates when a group has a single run."""
+    values_a, values_b = np.asarray(values_a, dtype=np.float64), np.asarray(values_b, dtype=np.float64)
+    if len(values_a) < 2 or len(values_b) < 2:
+        return None
+    means_a = values_a[rng.integers(0, len(values_a), size=(replicates, len(values_a)))].mean(axis=1)
+    means_b = values_b[rng.integers(0, len(values_b), size=(replicates, len(values_b)))].mean(axis=1)
+    return means_b - means_a
+
+
+def difference_row(metric, a, b, diffs, confidence, **extra):
+    alpha = (1 - confidence) / 2
+    row = {"metric": metric, "a": a, "b": b, "diff": b - a, "diff_pct": (b - a) / a * 100 if a else float("nan"),
+           "ci_low": float("nan"), "ci_high": float("nan"), "significant": "n/a", **extra}
+    if diffs is not None:
+        row["ci_low"], row["ci_high"] = (float(v) for v in np.quantile(diffs, [alpha, 1 - alpha]))
+        row["significant"] = "yes" if row["ci_low"] > 0 or row["ci_high"] < 0 else "no"
+    return row
+
+
+# --- Report ---
+def compare(args, names, rng):
+    rows = []
+    latency = {name: [] for name in names}
+    throughput = {name: [] for name in names}
+    for name, pattern in args.throughput:
+        for path in sorted(glob.glob(pattern)):
+            throughput[name].extend(load_trial_throughputs(path))
+    # Each run counts once: --throughput files, when given, stand in for the JSON metadata
+    trial_files = {name for name, _ in args.throughput}
+    for name, pattern in args.latency:
+        for path in sorted(glob.glob(pattern)):
+            counts, run_throughput = load_latency_run(path, args.ops)
+            latency[name].append(counts)
+            if run_throughput is not None and name not in trial_files:
+                throughput[name].append(run_throughput)
+
+    a, b = names
+    if throughput[a] and throughput[b]:
+        diffs = bootstrap_run_means(throughput[a], throughput[b], args.resamples, rng)
+        rows.append(difference_row("throughput_ops", float(np.mean(throughput[a])), float(np.mean(throughput[b])), diffs,
+                                   args.confidence, runs_a=len(throughput[a]), runs_b=len(throughput[b])))
+
+    def run_histogram(run, label):
+        if label in run:
+            return run[label]
+        return sum(run[op] for op in args.ops if op in run) if label == "all" else 0
+
+    untyped = any("all" in run for name in names for run in latency[name])
+    for label in list(args.ops) + (["all"] if len(args.ops) > 1 or untyped else []):
+        runs = {name: [run_histogram(run, label) for run in latency[name]] for name in names}
+        runs = {name: [hist for hist in hists if np.any(hist)] for name, hists in runs.items()}
+        if not runs[a] or not runs[b]:
+            continue
+        samples = {name: int(sum(hist.sum() for hist in runs[name])) for name in names}
+        for stat, (value_a, value_b, diffs) in bootstrap_latency(runs[a], runs[b], PERCENTILES, args.resamples, rng).items():
+            rows.append(difference_row(f"{label}_{stat}", value_a, value_b, diffs, args.confidence,
+                                       runs_a=len(runs[a]), runs_b=len(runs[b]), samples_a=samples[a], samples_b=samples[b]))
+
+    container = {name: [] for name in names}
+    for name, pattern in args.stats:
+        for path in sorted(glob.glob(pattern)):
+            container[name].append(summarize(*load_run(path), args.steady_start, args.steady_end))
+    if container[a] and container[b]:
+        for metric, key in STATS_METRICS:
+            values = {name: [run[key] for run in container[name] if not np.isnan(run[key])] for name in names}
+            if values[a] and values[b]:
+                diffs = bootstrap_run_means(values[a], values[b], args.resamples, rng)
+                rows.append(difference_row(metric, float(np.mean(values[a])), float(np.mean(values[b])), diffs, args.confidence,
+                                           runs_a=len(values[a]), runs_b=len(values[b]),
+                                           samples_a=sum(run["steady_samples"] for run in container[a]),
+                                           samples_b=sum(run["steady_samples"] for run in container[b])))
+    return rows
+
+
+def print_rows(rows, names, confidence):
+    a, b = names
+    print(f"\n=== {b} vs {a} ({confidence:.0%} bootstrap intervals on {b} - {a}) ===")
+    print(f"{'metric':<24}{a[:12]:>13}{b[:12]:>13}{'diff':>12}{'diff %':>9}{'ci low':>12}{'ci high':>12}  significant")
+    for row in rows:
+        print(f"{row['metric']:<24}{row['a']:>13.2f}{row['b']:>13.2f}{row['diff']:>12.2f}{row['diff_pct']:>8.1f}%"
+              f"{row['ci_low']:>12.2f}{row['ci_high']:>12.2f}  {row['significant']}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Bootstrap comparison of two groups of load-test runs (e.g. TDX vs non-TDX)")
+    p.add_argument("--latency", nargs=2, action="append", default=[], metavar=("NAME", "GLOB"),
+                   help="Group name and a glob of --save-histograms JSON files or per-request latency files; repeat per group")
+    p.add_argument("--stats", nargs=2, action="append", default=[], metavar=("NAME", "GLOB"),
+                   help="Group name and a glob of container stats files; repeat per group")
+    p.add_argument("--throughput", nargs=2, action="append", default=[], metavar=("NAME", "GLOB"),
+                   help="Group name and a glob of benchmarkData.csv-style trial files; repeat per group")
+    p.add_argument("--baseline", default=None, help="Group to subtract (A); default the first group named")
+    p.add_argument("--ops", nargs="+", default=["mixed_read", "mixed_write"], help="Op types to compare latencies for (default: mixed_read mixed_write)")
+    p.add_argument("--resamples", type=int, default=2000, help="Bootstrap replicates (default: 2000)")
+    p.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals (default: 0.95)")
+    p.add_argument("--steady-start", type=float, default=10.0, help="Seconds to skip at the start of each container stats run (default: 10)")
+    p.add_argument("--steady-end", type=float, default=None, help="End of the container stats steady-state window in seconds (default: end of run)")
+    p.add_argument("--seed", type=int, default=None, help="Random seed, for repeatable intervals")
+    p.add_argument("--out", default=None, help="Write the comparison to this CSV")
+    p.add_argument("--json", default=None, help="Write the comparison to this JSON file")
+    args = p.parse_args()
+
+    names = list(dict.fromkeys(name for name, _ in args.latency + args.stats + args.throughput))
+    if len(names) != 2:
+        p.error(f"exactly two groups are needed, got {len(names)}: {', '.join(names) or 'none'}")
+    if args.baseline is not None:
+        if args.baseline not in names:
+            p.error(f"--baseline {args.baseline} is not one of the groups ({', '.join(names)})")
+        names.sort(key=lambda name: name != args.baseline)
+    if not 0 < args.confidence < 1:
+        p.error("--confidence must be between 0 and 1")
+
+    rows = compare(args, names, np.random.default_rng(args.seed))
+    if not rows:
+        print("Nothing to compare: no metric has data for both groups")
+        return
+    print_rows(rows, names, args.confidence)
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nResults written to {args.out}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"baseline": names[0], "group": names[1], "confidence": args.confidence,
+                       "resamples": args.resamples, "results": rows}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
 import time
 import os
+import csv
 import argparse
-import docker
+import signal
+try:
+    import docker
+except ImportError:
+    docker = None
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CSV_FIELDS = [
+    "timestamp", "cpu_pct", "mem_usage", "mem_pct",
+    "cpu_user_pct", "cpu_system_pct", "throttled_usec",
+    "mem_anon", "mem_file", "io_read_bytes", "io_write_bytes",
+]
+FLUSH_ROWS = 100000
+stop_requested = False
+
+def request_stop(signum, frame):
+    # SIGINT/SIGTERM end the sampling loop early; the rows sampled so far are still written
+    global stop_requested
+    stop_requested = True
 
 def get_sched_latency_ns():
     """
@@ -45,11 +64,162 @@ def sample_stats(container):
         "mem_pct": mem_pct
     }
 
+def find_cgroup_dir(container):
+    """
+    Locate a container's cgroup v2 directory. Prefer the unified-hierarchy entry
+    in /proc/<pid>/cgroup of its init process, then fall back to where the
+    systemd and cgroupfs cgroup drivers put Docker containers.
+    """
+    candidates = []
+    pid = container.attrs.get("State", {}).get("Pid")
+    if pid:
+        try:
+            with open(f"/proc/{pid}/cgroup", "r") as f:
+                for line in f:
+                    if line.startswith("0::"):
+                        candidates.append(os.path.join(CGROUP_ROOT, line[3:].strip().lstrip("/")))
+        except OSError:
+            pass
+    candidates.append(os.path.join(CGROUP_ROOT, "system.slice", f"docker-{container.id}.scope"))
+    candidates.append(os.path.join(CGROUP_ROOT, "docker", container.id))
+    for path in candidates:
+        if os.path.isfile(os.path.join(path, "cpu.stat")):
+            return path
+    return None
+
+def host_memory_bytes():
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+class CgroupReader:
+    """
+    Reads a cgroup v2 directory's counters. The files are opened once and
+    re-read with pread, so a sample costs a few syscalls and no Docker API call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fds = {}
+        for name in ("cpu.stat", "memory.current", "memory.stat", "io.stat"):
+            try:
+                self.fds[name] = os.open(os.path.join(path, name), os.O_RDONLY)
+            except OSError:
+                # io.stat only exists when the io controller is enabled for the group
+                if name != "io.stat":
+                    raise
+        try:
+            with open(os.path.join(path, "memory.max"), "r") as f:
+                limit = f.read().strip()
+        except OSError:
+            limit = "max"
+        self.mem_limit = host_memory_bytes() if limit == "max" else int(limit)
+
+    def _read(self, name):
+        return os.pread(self.fds[name], 65536, 0).decode()
+
+    @staticmethod
+    def _keyed(text):
+        values = {}
+        for line in text.splitlines():
+            key, _, value = line.partition(" ")
+            values[key] = int(value)
+        return values
+
+    def read(self):
+        cpu = self._keyed(self._read("cpu.stat"))
+        mem = self._keyed(self._read("memory.stat"))
+        io_read = io_write = 0
+        if "io.stat" in self.fds:
+            for line in self._read("io.stat").splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        io_read += int(value)
+                    elif key == "wbytes":
+                        io_write += int(value)
+        return {
+            "usage_usec": cpu["usage_usec"],
+            "user_usec": cpu.get("user_usec", 0),
+            "system_usec": cpu.get("system_usec", 0),
+            "throttled_usec": cpu.get("throttled_usec", 0),
+            "mem_usage": int(self._read("memory.current")),
+            "mem_anon": mem.get("anon", 0),
+            "mem_file": mem.get("file", 0),
+            "io_read_bytes": io_read,
+            "io_write_bytes": io_write,
+        }
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+
+def sample_cgroup(reader, duration, interval, writer):
+    """
+    Sample the cgroup every interval seconds for duration seconds. CPU, throttling
+    and IO are deltas over the interval; memory is the current value. Rows are
+    buffered and written in bulk so file IO stays out of the sampling loop, and
+    whatever is buffered is written however the loop ends.
+    """
+    rows = []
+    try:
+        prev = reader.read()
+        prev_perf = time.perf_counter()
+        next_perf = prev_perf + interval
+        end_perf = prev_perf + duration
+        while next_perf <= end_perf and not stop_requested:
+            delay = next_perf - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            now_perf = time.perf_counter()
+            timestamp = time.time()
+            cur = reader.read()
+            elapsed_usec = (now_perf - prev_perf) * 1e6
+            rows.append((
+                f"{timestamp:.5f}",
+                f"{(cur['usage_usec'] - prev['usage_usec']) / elapsed_usec * 100.0:.5f}",
+                cur["mem_usage"],
+                f"{cur['mem_usage'] / reader.mem_limit * 100.0 if reader.mem_limit else 0.0:.5f}",
+                f"{(cur['user_usec'] - prev['user_usec']) / elapsed_usec * 100.0:.5f}",
+                f"{(cur['system_usec'] - prev['system_usec']) / elapsed_usec * 100.0:.5f}",
+                cur["throttled_usec"] - prev["throttled_usec"],
+                cur["mem_anon"],
+                cur["mem_file"],
+                cur["io_read_bytes"] - prev["io_read_bytes"],
+                cur["io_write_bytes"] - prev["io_write_bytes"],
+            ))
+            if len(rows) >= FLUSH_ROWS:
+                writer.writerows(rows)
+                rows.clear()
+            prev, prev_perf = cur, now_perf
+            next_perf += interval
+            # If we fell behind (e.g. descheduled), skip missed ticks instead of sampling in a burst
+            if next_perf < now_perf:
+                next_perf = now_perf + interval
+    finally:
+        writer.writerows(rows)
+
+def sample_docker(container, duration, interval, output):
+    end = time.time() + duration
+    with open(output, "w") as f:
+        f.write("timestamp,cpu_pct,mem_usage,mem_pct\n")
+        while time.time() < end and not stop_requested:
+            stats = sample_stats(container)
+            f.write(
+                f"{stats['timestamp']:.5f},"
+                f"{stats['cpu_pct']:.5f},"
+                f"{stats['mem_usage']},"
+                f"{stats['mem_pct']:.5f}\n"
+            )
+            time.sleep(interval)
+
 def main():
     p = argparse.ArgumentParser(
         description="Sample Docker container CPU/memory every scheduling quantum"
     )
-    p.add_argument("container", help="Container ID or name")
+    p.add_argument("container", nargs="?", help="Container ID or name")
     p.add_argument(
         "--duration", "-d",
         type=int, default=180,
@@ -60,37 +230,79 @@ def main():
         default="stats.csv",
         help="Output CSV file"
     )
+    p.add_argument(
+        "--backend",
+        choices=["auto", "cgroup", "docker"], default="auto",
+        help="Read cgroup v2 files directly, or poll the Docker stats API "
+             "(default: auto, cgroup when the container's cgroup can be found)"
+    )
+    p.add_argument(
+        "--interval", "-i",
+        type=float, default=None,
+        help="Sampling interval (sec); default 0.01 for cgroup, the scheduling quantum for docker"
+    )
+    p.add_argument(
+        "--cgroup-dir",
+        default=None,
+        help="Sample this cgroup v2 directory instead of looking up a container"
+    )
     args = p.parse_args()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
 
-    # Determine quantum (seconds)
-    latency_ns = get_sched_latency_ns()
-    if latency_ns is None:
-        print("Warning: could not read sched_latency_ns; defaulting to 100 ms")
-        quantum_s = 0.1
-    else:
-        quantum_s = latency_ns / 1e9
+    cgroup_dir = args.cgroup_dir
+    if cgroup_dir is not None and not os.path.isfile(os.path.join(cgroup_dir, "cpu.stat")):
+        p.error(f"{cgroup_dir} is not a cgroup v2 directory (no cpu.stat)")
+    container = None
+    if cgroup_dir is None:
+        if not args.container:
+            p.error("a container is required unless --cgroup-dir is given")
+        if docker is None:
+            p.error("the docker package is required to look up a container; use --cgroup-dir instead")
+        # Connect to Docker
+        client = docker.from_env()
+        try:
+            container = client.containers.get(args.container)
+        except docker.errors.NotFound:
+            print(f"Error: no such container '{args.container}'")
+            return
+        if args.backend != "docker":
+            cgroup_dir = find_cgroup_dir(container)
+            if cgroup_dir is None:
+                if args.backend == "cgroup":
+                    print(f"Error: could not find a cgroup v2 directory for '{args.container}'")
+                    return
+                print("Warning: no cgroup v2 directory found; falling back to the Docker stats API")
 
-    # Connect to Docker
-    client = docker.from_env()
-    try:
-        container = client.containers.get(args.container)
-    except docker.errors.NotFound:
-        print(f"Error: no such container '{args.container}'")
+    if cgroup_dir is not None and args.backend != "docker":
+        interval = args.interval if args.interval is not None else 0.01
+        try:
+            reader = CgroupReader(cgroup_dir)
+        except OSError as e:
+            print(f"Error: cannot read {os.path.basename(e.filename or '')} in {cgroup_dir}: {e.strerror}")
+            return
+        try:
+            with open(args.output, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(CSV_FIELDS)
+                sample_cgroup(reader, args.duration, interval, writer)
+        finally:
+            reader.close()
+        print(f"Done! Stats from {cgroup_dir} written to {args.output}")
         return
 
-    end = time.time() + args.duration
-    with open(args.output, "w") as f:
-        f.write("timestamp,cpu_pct,mem_usage,mem_pct\n")
-        while time.time() < end:
-            stats = sample_stats(container)
-            f.write(
-                f"{stats['timestamp']:.5f},"
-                f"{stats['cpu_pct']:.5f},"
-                f"{stats['mem_usage']},"
-                f"{stats['mem_pct']:.5f}\n"
-            )
-            time.sleep(quantum_s)
+    # Determine quantum (seconds)
+    if args.interval is not None:
+        quantum_s = args.interval
+    else:
+        latency_ns = get_sched_latency_ns()
+        if latency_ns is None:
+            print("Warning: could not read sched_latency_ns; defaulting to 100 ms")
+            quantum_s = 0.1
+        else:
+            quantum_s = latency_ns / 1e9
 
+    sample_docker(container, args.duration, quantum_s, args.output)
     print(f"Done! Stats written to {args.output}")
 
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+"""
+Fixed-memory latency histograms for the load generator.
+
+Latencies are stored in microseconds in log-linear (HDR-style) buckets: every
+value below SUB_BUCKET_COUNT gets its own bucket, and each power of two above
+that is split into SUB_BUCKET_COUNT / 2 equal sub-buckets. That keeps the
+relative error under 1% from 1 us up to an hour, in a few thousand counters,
+however many requests are recorded.
+"""
+import json
+import math
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+MAX_TRACKABLE_US = 3600 * 1000 * 1000  # 1 hour
+
+
+def _bucket_index(value_us):
+    if value_us < SUB_BUCKET_COUNT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    return (shift << (SUB_BUCKET_BITS - 1)) + (value_us >> shift)
+
+
+def bucket_bounds(index):
+    """Return the (lowest, highest) microsecond value that lands in a bucket."""
+    if index < SUB_BUCKET_COUNT:
+        return index, index
+    half = SUB_BUCKET_COUNT >> 1
+    shift = index // half - 1
+    lowest = (index - shift * half) << shift
+    return lowest, lowest + (1 << shift) - 1
+
+
+BUCKET_COUNT = _bucket_index(MAX_TRACKABLE_US) + 1
+
+
+def status_class(status):
+    """Collapse an HTTP status (or the error strings make_request uses) into a class like '2xx'."""
+    if isinstance(status, int):
+        return f"{status // 100}xx"
+    return str(status)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram. Values go in and come out in milliseconds."""
+
+    __slots__ = ("counts", "count", "total_us", "min_us", "max_us")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, latency_ms, n=1):
+        value_us = min(max(int(latency_ms * 1000), 0), MAX_TRACKABLE_US)
+        self.counts[_bucket_index(value_us)] += n
+        self.count += n
+        self.total_us += value_us * n
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        counts = self.counts
+        for index, n in enumerate(other.counts):
+            if n:
+                counts[index] += n
+        self.count += other.count
+        self.total_us += other.total_us
+        if self.min_us is None or other.min_us < self.min_us:
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    @property
+    def mean(self):
+        return self.total_us / self.count / 1000 if self.count else 0.0
+
+    @property
+    def min(self):
+        return (self.min_us or 0) / 1000
+
+    @property
+    def max(self):
+        return self.max_us / 1000
+
+    def percentile(self, pct):
+        """Latency (ms) at or below which pct percent of recorded values fall."""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * pct / 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            if seen >= target:
+                lowest, highest = bucket_bounds(index)
+                value_us = min(max((lowest + highest) / 2, self.min_us), self.max_us)
+                return value_us / 1000
+        return self.max
+
+    def percentiles(self, pcts):
+        return {pct: self.percentile(pct) for pct in pcts}
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_us": self.total_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "buckets": {str(i): n for i, n in enumerate(self.counts) if n},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls()
+        for index, n in data["buckets"].items():
+            hist.counts[int(index)] = n
+        hist.count = data["count"]
+        hist.total_us = data["total_us"]
+        hist.min_us = data["min_us"]
+        hist.max_us = data["max_us"]
+        return hist
+
+
+class LatencyStats:
+    """
+    Latency histograms keyed by (operation type, status class), plus named
+    per-operation counters (conflicts, late sends, ...) and, when requests are
+    traced, histograms per (operation type, request phase). Stats from
+    separate runs or processes combine with merge().
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.phases = {}
+
+    def record(self, op_type, status, latency_ms):
+        key = (op_type, status_class(status))
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        hist.record(latency_ms)
+
+    def record_phase(self, op_type, phase, latency_ms):
+        key = (op_type, phase)
+        hist = self.phases.get(key)
+        if hist is None:
+            hist = self.phases[key] = LatencyHistogram()
+        hist.record(latency_ms)
+
+    def op_phases(self, op_type):
+        return [phase for op, phase in self.phases if op == op_type]
+
+    def phase_histogram(self, op_types, phase):
+        merged = LatencyHistogram()
+        for (op, p), hist in self.phases.items():
+            if op in op_types and p == phase:
+                merged.merge(hist)
+        return merged
+
+    def increment(self, op_type, name, n=1):
+        op_counters = self.counters.setdefault(op_type, {})
+        op_counters[name] = op_counters.get(name, 0) + n
+
+    def op_types(self):
+        seen = {}
+        for op_type, _ in self.histograms:
+            seen[op_type] = True
+        return list(seen)
+
+    def status_counts(self, op_type):
+        return {cls: hist.count for (op, cls), hist in self.histograms.items() if op == op_type}
+
+    def count(self, op_type, cls=None):
+        return sum(n for c, n in self.status_counts(op_type).items() if cls is None or c == cls)
+
+    def histogram(self, op_types, classes=None):
+        """Merge the histograms of the given operation types (and optionally status classes)."""
+        merged = LatencyHistogram()
+        for (op, cls), hist in self.histograms.items():
+            if op in op_types and (classes is None or cls in classes):
+                merged.merge(hist)
+        return merged
+
+    def merge(self, other):
+        for key, hist in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(hist)
+            else:
+                self.histograms[key] = LatencyHistogram().merge(hist)
+        for key, hist in other.phases.items():
+            if key in self.phases:
+                self.phases[key].merge(hist)
+            else:
+                self.phases[key] = LatencyHistogram().merge(hist)
+        for op_type, op_counters in other.counters.items():
+            for name, n in op_counters.items():
+                self.increment(op_type, name, n)
+        return self
+
+    def to_dict(self):
+        return {
+            "histograms": [
+                {"type": op, "class": cls, **hist.to_dict()}
+                for (op, cls), hist in self.histograms.items()
+            ],
+            "counters": self.counters,
+            "phases": [
+                {"type": op, "phase": phase, **hist.to_dict()}
+                for (op, phase), hist in self.phases.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for entry in data["histograms"]:
+            stats.histograms[(entry["type"], entry["class"])] = LatencyHistogram.from_dict(entry)
+        for entry in data.get("phases", []):
+            stats.phases[(entry["type"], entry["phase"])] = LatencyHistogram.from_dict(entry)
+        for op_type, op_counters in data["counters"].items():
+            for name, n in op_counters.items():
+                stats.increment(op_type, name, n)
+        return stats
+
+    def save(self, path, **meta):
+        with open(path, "w") as f:
+            json.dump({"meta": meta, **self.to_dict()}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Return (stats, meta) from a file written by save()."""
+        with open(path) as f:
+            data = json.load(f)
+        return cls.from_dict(data), data.get("meta", {})
+
+
+class IntervalRecorder:
+    """
+    Latency stats bucketed into fixed wall-clock windows (epoch ms, aligned to
+    multiples of the interval). Only the window in progress is held; roll()
+    hands back the windows that have closed, including empty ones, so the
+    caller can write them out and drop them.
+    """
+
+    def __init__(self, interval_s=1.0):
+        self.interval_ms = max(1, int(interval_s * 1000))
+        self.window_start = None
+        self.current = LatencyStats()
+        self.closed = []
+
+    def _advance(self, now_ms):
+        start = int(now_ms // self.interval_ms * self.interval_ms)
+        if self.window_start is None:
+            self.window_start = start
+            return
+        while self.window_start < start:
+            self.closed.append((self.window_start, self.current))
+            self.current = LatencyStats()
+            self.window_start += self.interval_ms
+
+    def record(self, op_type, status, latency_ms, now_ms):
+        self._advance(now_ms)
+        self.current.record(op_type, status, latency_ms)
+
+    def roll(self, now_ms):
+        """Return [(window_start_ms, LatencyStats)] for every window that ended by now_ms."""
+        self._advance(now_ms)
+        closed, self.closed = self.closed, []
+        return closed
+
+    def flush(self):
+        """Return all remaining windows, including the partial one in progress."""
+        closed, self.closed = self.closed, []
+        if self.window_start is not None and self.current.histograms:
+            closed.append((self.window_start, self.current))
+        self.current = LatencyStats()
+        return closed
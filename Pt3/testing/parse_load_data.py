@@ -1,6 +1,9 @@
 import csv
 import re
-import matplotlib.pyplot as plt
+import glob
+import itertools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 def parse_mem(mem_str):
     """Parse memory string like '186.5MiB / 14.67GiB' and return used, total in MiB."""
@@ -66,6 +69,7 @@ def write_csv(rows, out_csv):
             writer.writerow(row)
 
 def plot_stats(rows):
+    import matplotlib.pyplot as plt
     import matplotlib.dates as mdates
     import datetime
     timestamps = [row["timestamp"] for row in rows]
@@ -87,10 +91,305 @@ def plot_stats(rows):
     plt.tight_layout()
     plt.show()
 
+# --- Multi-run comparison ---
+PERCENTILES = (50, 95, 99)
+
+def load_run(filename, align=True):
+    """
+    Stream one run into columnar arrays: (seconds since the first sample, CPU %,
+    memory used in MiB). Accepts raw `docker stats` dumps as well as CSVs written
+    by write_csv or get_container_stats.py. With align=False the times are epoch
+    seconds instead.
+    """
+    import numpy as np
+    ts, cpu, mem = array('d'), array('d'), array('d')
+    with open(filename, 'r') as f:
+        first = f.readline()
+        if first.startswith('timestamp,'):
+            header = first.strip().split(',')
+            reader = csv.reader(f)
+            t_col = header.index('timestamp')
+            if 'cpu_percent' in header:
+                cpu_col, mem_col, mem_scale = header.index('cpu_percent'), header.index('mem_used_mib'), 1.0
+            else:
+                cpu_col, mem_col, mem_scale = header.index('cpu_pct'), header.index('mem_usage'), 1 / (1024 * 1024)
+            for row in reader:
+                if row:
+                    ts.append(float(row[t_col]))
+                    cpu.append(float(row[cpu_col]))
+                    mem.append(float(row[mem_col]) * mem_scale)
+        else:
+            # Raw dump: a millisecond timestamp line followed by a "container,cpu,mem" line
+            pending_ts = None
+            for line in itertools.chain([first], f):
+                line = line.strip()
+                if not line:
+                    continue
+                if pending_ts is None:
+                    try:
+                        pending_ts = int(line)
+                    except ValueError:
+                        pass
+                    continue
+                parts = line.split(',')
+                if len(parts) == 3:
+                    ts.append(pending_ts)
+                    cpu.append(parse_cpu(parts[1]))
+                    mem.append(parse_mem(parts[2])[0])
+                    pending_ts = None
+                else:
+                    try:
+                        pending_ts = int(line)
+                    except ValueError:
+                        pending_ts = None
+    t = np.frombuffer(ts, dtype=np.float64)
+    if len(t):
+        # Docker dumps and write_csv use epoch ms; get_container_stats.py uses epoch seconds
+        t = ((t - t[0]) if align else t) / (1000.0 if t[0] > 1e11 else 1.0)
+    return t, np.frombuffer(cpu, dtype=np.float64), np.frombuffer(mem, dtype=np.float64)
+def summarize(t, cpu, mem, steady_start, steady_end):
+    """Whole-run and steady-state CPU/memory statistics for one run (or a pooled group)."""
+    import numpy as np
+    steady = (t >= steady_start) & (t <= steady_end if steady_end is not None else True)
+    summary = {
+        "samples": len(t),
+        "duration_s": float(t[-1]) if len(t) else 0.0,
+        "cpu_mean": float(cpu.mean()) if len(cpu) else float('nan'),
+        "cpu_max": float(cpu.max()) if len(cpu) else float('nan'),
+        "mem_mean_mib": float(mem.mean()) if len(mem) else float('nan'),
+        "mem_max_mib": float(mem.max()) if len(mem) else float('nan'),
+        "steady_samples": int(steady.sum()),
+    }
+    steady_cpu = cpu[steady]
+    if len(steady_cpu):
+        for pct, value in zip(PERCENTILES, np.percentile(steady_cpu, PERCENTILES)):
+            summary[f"steady_cpu_p{pct}"] = float(value)
+        summary["steady_cpu_mean"] = float(steady_cpu.mean())
+        summary["steady_mem_mean_mib"] = float(mem[steady].mean())
+    else:
+        for pct in PERCENTILES:
+            summary[f"steady_cpu_p{pct}"] = float('nan')
+        summary["steady_cpu_mean"] = float('nan')
+        summary["steady_mem_mean_mib"] = float('nan')
+    return summary
+
+def compare_groups(groups, steady_start=10.0, steady_end=None, jobs=1):
+    """
+    groups: list of (name, [files]). Returns (rows, runs) where rows has one
+    summary per run plus one pooled summary per group, and runs maps
+    group name -> list of (file, t, cpu, mem) for plotting.
+    """
+    import numpy as np
+    files = [path for _, paths in groups for path in paths]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            loaded = dict(zip(files, pool.map(load_run, files, chunksize=8)))
+    else:
+        loaded = {path: load_run(path) for path in files}
+
+    rows, runs = [], {}
+    for name, paths in groups:
+        runs[name] = [(path, *loaded[path]) for path in paths]
+        for path, t, cpu, mem in runs[name]:
+            rows.append({"group": name, "run": path, **summarize(t, cpu, mem, steady_start, steady_end)})
+        if runs[name]:
+            t = np.concatenate([run[1] for run in runs[name]])
+            cpu = np.concatenate([run[2] for run in runs[name]])
+            mem = np.concatenate([run[3] for run in runs[name]])
+            pooled = summarize(t, cpu, mem, steady_start, steady_end)
+            run_means = np.array([row["steady_cpu_mean"] for row in rows if row["group"] == name and row["run"] != "pooled"])
+            pooled["duration_s"] = max(float(run[1][-1]) for run in runs[name] if len(run[1]))
+            pooled["run_cpu_mean_std"] = float(np.nanstd(run_means)) if len(run_means) > 1 else 0.0
+            rows.append({"group": name, "run": "pooled", **pooled})
+    return rows, runs
+
+def print_comparison(rows):
+    columns = ["samples", "duration_s", "cpu_mean", "steady_cpu_mean"] + [f"steady_cpu_p{p}" for p in PERCENTILES] + ["cpu_max", "steady_mem_mean_mib", "mem_max_mib"]
+    widths = [max(len(c), 8) for c in columns]
+    print(f"{'group':<12} {'run':<28} " + " ".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        if row["run"] == "pooled":
+            print("-" * (41 + sum(w + 1 for w in widths)))
+        values = " ".join(f"{row[c]:>{w}.2f}" if isinstance(row[c], float) else f"{row[c]:>{w}}" for c, w in zip(columns, widths))
+        print(f"{row['group']:<12} {row['run'][-28:]:<28} {values}")
+
+def write_comparison_csv(rows, out_csv):
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+    with open(out_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def plot_overlay(runs, out_file=None, grid_step=1.0):
+    """Overlay every run's CPU and memory against time since its first sample, with each group's mean."""
+    import numpy as np
+    import matplotlib
+    if out_file:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, (ax_cpu, ax_mem) = plt.subplots(2, 1, figsize=(12, 6), sharex=True)
+    for color, (name, group_runs) in zip(plt.rcParams['axes.prop_cycle'].by_key()['color'], runs.items()):
+        if not group_runs:
+            continue
+        end = min(run[1][-1] for run in group_runs)
+        grid = np.arange(0, end + grid_step, grid_step)
+        for _, t, cpu, mem in group_runs:
+            ax_cpu.plot(t, cpu, color=color, alpha=0.25, linewidth=0.8)
+            ax_mem.plot(t, mem, color=color, alpha=0.25, linewidth=0.8)
+        ax_cpu.plot(grid, np.mean([np.interp(grid, t, cpu) for _, t, cpu, _ in group_runs], axis=0), color=color, linewidth=2, label=f"{name} mean ({len(group_runs)} runs)")
+        ax_mem.plot(grid, np.mean([np.interp(grid, t, mem) for _, t, _, mem in group_runs], axis=0), color=color, linewidth=2, label=name)
+    ax_cpu.set_ylabel("CPU %")
+    ax_cpu.set_title("Container CPU and Memory Usage by Group")
+    ax_cpu.grid(True)
+    ax_cpu.legend()
+    ax_mem.set_ylabel("Memory Used (MiB)")
+    ax_mem.set_xlabel("Seconds since first sample")
+    ax_mem.grid(True)
+    fig.tight_layout()
+    if out_file:
+        fig.savefig(out_file, dpi=120)
+    else:
+        plt.show()
+
+def compare_main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description="Compare container CPU/memory across groups of runs (e.g. TDX vs non-TDX)")
+    p.add_argument("--group", nargs=2, action="append", metavar=("NAME", "GLOB"), required=True,
+                   help="Group name and a glob of raw docker stats dumps or parsed CSVs; repeat per group (or per glob)")
+    p.add_argument("--steady-start", type=float, default=10.0, help="Seconds to skip at the start of each run for steady-state stats (default: 10)")
+    p.add_argument("--steady-end", type=float, default=None, help="End of the steady-state window in seconds (default: end of run)")
+    p.add_argument("--out", default="comparison.csv", help="Output CSV with per-run and pooled stats (default: comparison.csv)")
+    p.add_argument("--plot", default=None, help="Save the overlay plot to this file instead of showing it")
+    p.add_argument("--no-plot", action="store_true", help="Skip the overlay plot")
+    p.add_argument("--jobs", type=int, default=1, help="Parse runs in this many processes (default: 1)")
+    args = p.parse_args(argv)
+
+    groups = {}
+    for name, pattern in args.group:
+        groups.setdefault(name, []).extend(sorted(glob.glob(pattern)))
+    rows, runs = compare_groups(list(groups.items()), args.steady_start, args.steady_end, args.jobs)
+    print_comparison(rows)
+    write_comparison_csv(rows, args.out)
+    print(f"Wrote {len(rows)} rows to {args.out}")
+    if not args.no_plot:
+        plot_overlay(runs, args.plot)
+
+# --- Latency / container stats join ---
+TIMESERIES_COLUMNS = ("timestamp_ms", "interval_s", "count", "errors", "ops_per_sec", "p50_ms", "p99_ms")
+
+def load_timeseries(path):
+    """Read a test_speed.py --timeseries CSV into {op_type: {column: array}}."""
+    import numpy as np
+    columns = {}
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            op = columns.setdefault(row["op_type"], {name: array('d') for name in TIMESERIES_COLUMNS})
+            for name, col in op.items():
+                col.append(float(row[name]))
+    return {op_type: {name: np.frombuffer(col, dtype=np.float64) for name, col in cols.items()}
+            for op_type, cols in columns.items()}
+
+def join_timeseries(latency_csv, stats_file):
+    """
+    Align a test_speed.py time series with a container stats trace on the shared
+    epoch clock. Returns one column dict with a row per latency window: overall
+    throughput/errors/p50/p99, p99 per op type, and the container's mean CPU and
+    memory over the window. Windows without a container sample (docker stats
+    only reports every few seconds) take the value interpolated at the window
+    midpoint; windows outside the trace are NaN.
+    """
+    import numpy as np
+    series = load_timeseries(latency_csv)
+    overall = series.pop("all")
+    windows = overall["timestamp_ms"]
+    interval_ms = overall["interval_s"] * 1000
+    joined = {name: overall[name] for name in ("timestamp_ms", "ops_per_sec", "errors", "p50_ms", "p99_ms")}
+    for op_type, cols in sorted(series.items()):
+        values = np.full(len(windows), np.nan)
+        values[np.searchsorted(windows, cols["timestamp_ms"])] = cols["p99_ms"]
+        joined[f"{op_type}_p99_ms"] = values
+
+    t, cpu, mem = load_run(stats_file, align=False)
+    t_ms = t * 1000
+    idx = np.searchsorted(windows, t_ms, side='right') - 1
+    inside = (idx >= 0) & (t_ms < windows[np.clip(idx, 0, None)] + interval_ms[np.clip(idx, 0, None)])
+    counts = np.bincount(idx[inside], minlength=len(windows))
+    mid = windows + interval_ms / 2
+    for name, values in (("cpu_pct", cpu), ("mem_used_mib", mem)):
+        sums = np.bincount(idx[inside], weights=values[inside], minlength=len(windows))
+        interpolated = np.interp(mid, t_ms, values, left=np.nan, right=np.nan) if len(t_ms) else np.full(len(windows), np.nan)
+        joined[name] = np.where(counts > 0, sums / np.maximum(counts, 1), interpolated)
+    return joined
+
+def write_joined_csv(joined, out_csv):
+    names = list(joined)
+    with open(out_csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for i in range(len(joined["timestamp_ms"])):
+            writer.writerow([int(joined[n][i]) if n == "timestamp_ms" else f"{joined[n][i]:.3f}" for n in names])
+
+def plot_joined(joined, out_file=None):
+    import matplotlib
+    if out_file:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import datetime
+    times = [datetime.datetime.fromtimestamp(ts / 1000) for ts in joined["timestamp_ms"]]
+    fig, (ax_tput, ax_lat, ax_cpu) = plt.subplots(3, 1, figsize=(12, 8), sharex=True)
+    ax_tput.plot(times, joined["ops_per_sec"], label="ops/sec")
+    ax_tput.plot(times, joined["errors"], label="errors", color='red')
+    ax_tput.set_ylabel("Requests")
+    ax_tput.set_title("Load Test Latency vs Container Usage")
+    ax_tput.legend()
+    ax_lat.plot(times, joined["p50_ms"], label="all p50")
+    ax_lat.plot(times, joined["p99_ms"], label="all p99")
+    for name in joined:
+        if name.endswith("_p99_ms") and name != "p99_ms":
+            ax_lat.plot(times, joined[name], label=name[:-3], linewidth=0.8)
+    ax_lat.set_ylabel("Latency (ms)")
+    ax_lat.legend()
+    ax_cpu.plot(times, joined["cpu_pct"], label="CPU %")
+    ax_cpu.set_ylabel("CPU %")
+    ax_mem = ax_cpu.twinx()
+    ax_mem.plot(times, joined["mem_used_mib"], color='orange', label="Memory Used (MiB)")
+    ax_mem.set_ylabel("Memory Used (MiB)")
+    ax_cpu.set_xlabel("Time")
+    for ax in (ax_tput, ax_lat, ax_cpu):
+        ax.grid(True)
+    fig.tight_layout()
+    if out_file:
+        fig.savefig(out_file, dpi=120)
+    else:
+        plt.show()
+
+def join_main(argv):
+    import argparse
+    p = argparse.ArgumentParser(description="Join a test_speed.py --timeseries CSV with a container stats trace")
+    p.add_argument("--join", nargs=2, metavar=("TIMESERIES_CSV", "STATS_FILE"), required=True,
+                   help="test_speed.py time series and a get_container_stats.py CSV or raw docker stats dump")
+    p.add_argument("--out", default="joined.csv", help="Output CSV (default: joined.csv)")
+    p.add_argument("--plot", default=None, help="Save the aligned plot to this file instead of showing it")
+    p.add_argument("--no-plot", action="store_true", help="Skip the plot")
+    args = p.parse_args(argv)
+    joined = join_timeseries(*args.join)
+    write_joined_csv(joined, args.out)
+    print(f"Wrote {len(joined['timestamp_ms'])} rows to {args.out}")
+    if not args.no_plot:
+        plot_joined(joined, args.plot)
+
 if __name__ == "__main__":
     import sys
+    if "--group" in sys.argv:
+        compare_main(sys.argv[1:])
+        exit(0)
+    if "--join" in sys.argv:
+        join_main(sys.argv[1:])
+        exit(0)
     if len(sys.argv) < 2:
         print("Usage: python parse_load_data.py <input_file> [output_csv]")
+        print("       python parse_load_data.py --group NAME GLOB [--group NAME GLOB ...] [--out CSV] [--plot PNG]")
+        print("       python parse_load_data.py --join TIMESERIES_CSV STATS_FILE [--out CSV] [--plot PNG]")
         exit(1)
     infile = sys.argv[1]
     outfile = sys.argv[2] if len(sys.argv) > 2 else "parsed_stats.csv"
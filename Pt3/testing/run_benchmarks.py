@@ -0,0 +1,354 @@
+"""
+Run test_speed.py over a benchmark matrix and collect the results.
+
+Every cell of hosts x read-pool sizes x write fractions x concurrency levels
+is run --trials times. Read-pool sizes are server settings, so sweeping them
+needs --server-setup, a shell command that restarts the server with
+{read_pool} (and {host}) filled in. Each trial is a separate test_speed.py process that saves its latency
+histograms; get_container_stats.py can sample the server container alongside
+it. Results go to <out-dir>/results.json, a benchmarkData.csv per cell in the
+same layout as data/benchmarkData.csv, and a summary.csv with one row per
+cell. For every concurrency sweep the saturation knee is reported as the
+level with the highest power (throughput / mean latency): past it, extra
+clients mostly add queueing delay instead of throughput.
+
+Example:
+    python run_benchmarks.py --hosts 10.0.0.5 --concurrency 25 50 100 200 400 \\
+        --write-pct 0.1 --trials 4 --duration 60 --container sqlcipher -- --initial-load
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import ssl
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from latency_stats import LatencyStats
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_SPEED = os.path.join(HERE, "test_speed.py")
+CONTAINER_STATS = os.path.join(HERE, "get_container_stats.py")
+
+READS = ["mixed_read"]
+WRITES = ["mixed_write", "mixed_batch_write"]
+PERCENTILES = (90, 95, 99)
+
+
+def cell_name(host, concurrency, write_pct, read_pool=None):
+    name = f"{host.replace(':', '_')}_c{concurrency}_w{round(write_pct * 100)}"
+    return name if read_pool is None else f"{name}_r{read_pool}"
+
+
+def setup_server(args, host, read_pool):
+    """Run --server-setup for this host and read-pool size, then wait until the app answers through nginx."""
+    command = args.server_setup.format(host=host, read_pool=read_pool)
+    print(f"\n--- Server setup: {command} ---")
+    subprocess.run(command, shell=True, check=True)
+    context = ssl._create_unverified_context()
+    deadline = time.time() + args.server_timeout
+    while True:
+        try:
+            urllib.request.urlopen(f"https://{host}/records/__ready__", context=context, timeout=5)
+            return
+        except urllib.error.HTTPError as e:
+            # The app answers a missing record with its JSON 404; nginx's 502/504
+            # while the app is still starting mean keep waiting
+            if e.code == 404 and app_not_found(e):
+                return
+        except (urllib.error.URLError, OSError):
+            pass
+        if time.time() > deadline:
+            raise RuntimeError(f"Server at {host} did not come up within {args.server_timeout}s")
+        time.sleep(1)
+
+
+def app_not_found(response):
+    try:
+        return json.loads(response.read()).get("message") == "Record not found"
+    except (ValueError, AttributeError, OSError):
+        return False
+
+
+def trial_metrics(stats, mixed_ops, mixed_duration):
+    """Throughput and read/write latency percentiles for one trial (or pooled trials)."""
+    reads = stats.histogram(READS)
+    writes = stats.histogram(WRITES)
+    mixed = stats.histogram(READS + WRITES)
+    duration = mixed_duration or 1
+    metrics = {
+        "mixed_ops": mixed_ops,
+        "mixed_duration": mixed_duration,
+        "throughput": mixed_ops / duration,
+        "read_throughput": reads.count / duration,
+        "write_throughput": writes.count / duration,
+        "errors": mixed.count - stats.histogram(READS + WRITES, ["2xx"]).count,
+        "mean_ms": mixed.mean,
+    }
+    for pct in PERCENTILES:
+        metrics[f"read_p{pct}_ms"] = reads.percentile(pct)
+        metrics[f"write_p{pct}_ms"] = writes.percentile(pct)
+    # Client-side connection pool health: latencies only measure the server when queued stays near 0
+    pool = stats.counters.get("connection_pool", {})
+    connections = pool.get("new", 0) + pool.get("reused", 0)
+    metrics["new_connections"] = pool.get("new", 0)
+    metrics["reuse_ratio"] = pool.get("reused", 0) / connections if connections else 0.0
+    metrics["queued_for_socket"] = pool.get("queued", 0)
+    metrics["queue_wait_ms"] = pool.get("queue_ms", 0.0)
+    return metrics
+
+
+def run_trial(args, host, concurrency, write_pct, trial_dir, trial):
+    """Run one test_speed.py process (and optionally a container sampler); return its metrics or None."""
+    hist_path = os.path.join(trial_dir, f"trial_{trial}.json")
+    cmd = [
+        sys.executable, TEST_SPEED,
+        "--ip", host,
+        "--duration", str(args.duration),
+        "--concurrency", str(concurrency),
+        "--write-pct", str(write_pct),
+        "--save-histograms", hist_path,
+    ] + args.extra
+
+    sampler = None
+    if args.container:
+        # Sample until the trial ends; SIGINT stops the sampler, which then writes its buffered rows
+        sampler = subprocess.Popen(
+            [sys.executable, CONTAINER_STATS, args.container,
+             "--duration", str(args.duration * 10 + 600),
+             "--output", os.path.join(trial_dir, f"trial_{trial}_stats.csv")],
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        with open(os.path.join(trial_dir, f"trial_{trial}.log"), "w") as log:
+            returncode = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=HERE)
+    finally:
+        if sampler is not None:
+            sampler.send_signal(signal.SIGINT)
+            try:
+                sampler.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                sampler.kill()
+
+    if returncode != 0 or not os.path.exists(hist_path):
+        print(f"  Trial {trial} failed (exit {returncode}); see {trial_dir}/trial_{trial}.log")
+        return None, None
+    stats, meta = LatencyStats.load(hist_path)
+    return stats, meta
+
+
+def run_cell(args, host, concurrency, write_pct, read_pool=None):
+    name = cell_name(host, concurrency, write_pct, read_pool)
+    cell_dir = os.path.join(args.out_dir, name)
+    os.makedirs(cell_dir, exist_ok=True)
+    pool_note = f" read_pool={read_pool}" if read_pool is not None else ""
+    print(f"\n=== {name}: host={host} concurrency={concurrency} write_pct={write_pct}{pool_note} ===")
+
+    trials = []
+    pooled = LatencyStats()
+    pooled_ops = 0
+    pooled_duration = 0
+    for trial in range(1, args.trials + 1):
+        stats, meta = run_trial(args, host, concurrency, write_pct, cell_dir, trial)
+        if stats is None:
+            trials.append(None)
+            continue
+        metrics = trial_metrics(stats, meta.get("mixed_ops", 0), meta.get("mixed_duration", 0))
+        if meta.get("server_cache"):
+            # Only present when test_speed.py ran with --cache-stats
+            metrics["cache_hit_ratio"] = meta["server_cache"]["hit_ratio"]
+        print(f"  Trial {trial}: {metrics['throughput']:.2f} ops/s, "
+              f"read p99 {metrics['read_p99_ms']:.2f} ms, write p99 {metrics['write_p99_ms']:.2f} ms")
+        trials.append(metrics)
+        pooled.merge(stats)
+        pooled_ops += metrics["mixed_ops"]
+        pooled_duration += metrics["mixed_duration"]
+        if trial < args.trials and args.cooldown:
+            time.sleep(args.cooldown)
+
+    completed = [t for t in trials if t is not None]
+    average = {key: sum(t[key] for t in completed) / len(completed) for key in completed[0] if all(key in t for t in completed)} if completed else None
+    cell = {
+        "name": name,
+        "host": host,
+        "concurrency": concurrency,
+        "write_pct": write_pct,
+        "read_pool": read_pool,
+        "duration": args.duration,
+        "trials": trials,
+        "average": average,
+        # Percentiles over every trial's requests, rather than the mean of per-trial percentiles
+        "pooled": trial_metrics(pooled, pooled_ops, pooled_duration) if completed else None,
+    }
+    write_benchmark_csv(cell, os.path.join(cell_dir, "benchmarkData.csv"))
+    return cell
+
+
+def _fmt(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+def write_benchmark_csv(cell, path):
+    """Write one cell in the layout of data/benchmarkData.csv."""
+    trials = cell["trials"]
+    labels = [f"Trial {i}" for i in range(1, len(trials) + 1)] + ["Average"]
+    rows_data = trials + [cell["average"]]
+    width = 9
+    rows = [["", "Mixed Throughput (ops/s)", "Reads Only", "Writes Only"]]
+    for label, metrics in zip(labels, rows_data):
+        if metrics is None:
+            rows.append([label])
+        else:
+            rows.append([label, _fmt(metrics["throughput"]), _fmt(metrics["read_throughput"]), _fmt(metrics["write_throughput"])])
+    rows.append([])
+    rows.append(["", "Read Latency (ms)", "", "", "", "", "Write Latency (ms)"])
+    pct_header = [f"{pct}th Percentile" for pct in PERCENTILES]
+    rows.append([""] + pct_header + ["", ""] + pct_header)
+    for label, metrics in zip(labels, rows_data):
+        if metrics is None:
+            rows.append([label, "", "", "", "", label])
+        else:
+            rows.append([label] + [_fmt(metrics[f"read_p{pct}_ms"]) for pct in PERCENTILES]
+                        + ["", label] + [_fmt(metrics[f"write_p{pct}_ms"]) for pct in PERCENTILES])
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow(row + [""] * (width - len(row)))
+
+
+def find_knees(cells):
+    """
+    For each (host, write_pct, read_pool) concurrency sweep, pick the level
+    with the highest power (throughput / mean latency).
+    """
+    sweeps = {}
+    for cell in cells:
+        if cell["average"] is not None:
+            sweeps.setdefault((cell["host"], cell["write_pct"], cell["read_pool"]), []).append(cell)
+    knees = []
+    for (host, write_pct, read_pool), sweep in sweeps.items():
+        sweep.sort(key=lambda c: c["concurrency"])
+        if len(sweep) < 2:
+            continue
+        power = [c["average"]["throughput"] / c["average"]["mean_ms"] if c["average"]["mean_ms"] else 0 for c in sweep]
+        best = max(range(len(sweep)), key=power.__getitem__)
+        knee = sweep[best]
+        peak = max(sweep, key=lambda c: c["average"]["throughput"])
+        knees.append({
+            "host": host,
+            "write_pct": write_pct,
+            "read_pool": read_pool,
+            "knee_concurrency": knee["concurrency"],
+            "knee_throughput": knee["average"]["throughput"],
+            "knee_read_p99_ms": knee["average"]["read_p99_ms"],
+            "knee_write_p99_ms": knee["average"]["write_p99_ms"],
+            "peak_concurrency": peak["concurrency"],
+            "peak_throughput": peak["average"]["throughput"],
+            "power": dict(zip((c["concurrency"] for c in sweep), power)),
+        })
+    return knees
+
+
+SUMMARY_FIELDS = ["name", "host", "concurrency", "write_pct", "read_pool", "trials", "throughput", "read_throughput",
+                  "write_throughput", "errors"] + [f"{kind}_p{pct}_ms" for kind in ("read", "write") for pct in PERCENTILES]
+
+
+def write_summary_csv(cells, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_FIELDS)
+        for cell in cells:
+            average = cell["average"] or {}
+            completed = sum(t is not None for t in cell["trials"])
+            read_pool = "" if cell["read_pool"] is None else cell["read_pool"]
+            writer.writerow([cell["name"], cell["host"], cell["concurrency"], cell["write_pct"], read_pool, completed]
+                            + [_fmt(average.get(field)) for field in SUMMARY_FIELDS[6:]])
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, extra = argv[:split], argv[split + 1:]
+
+    p = argparse.ArgumentParser(description="Run test_speed.py over a benchmark matrix")
+    p.add_argument("--matrix", default=None,
+                   help="JSON file of option defaults, e.g. {\"hosts\": [\"10.0.0.5\"], \"concurrency\": [50, 100, 200]}; command-line flags override it")
+    p.add_argument("--hosts", nargs="+", default=["localhost"], help="Target hosts passed to test_speed.py --ip (default: localhost)")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[200], help="Concurrency levels to sweep (default: 200)")
+    p.add_argument("--write-pct", type=float, nargs="+", default=[0.10], help="Write fractions to sweep (default: 0.10)")
+    p.add_argument("--duration", type=int, default=60, help="Mixed-workload duration per trial in seconds (default: 60)")
+    p.add_argument("--trials", type=int, default=4, help="Trials per cell (default: 4)")
+    p.add_argument("--cooldown", type=float, default=5.0, help="Seconds to wait between trials (default: 5)")
+    p.add_argument("--read-pool", type=int, nargs="+", default=None, help="Server read-pool sizes to sweep; requires --server-setup")
+    p.add_argument("--server-setup", default=None,
+                   help="Shell command run before each host/read-pool combination, e.g. "
+                        "\"ssh {host} 'sudo docker rm -f fithealth && READ_POOL_SIZE={read_pool} ./secure_startup_script.sh'\"")
+    p.add_argument("--server-timeout", type=float, default=120, help="Seconds to wait for the server after --server-setup (default: 120)")
+    p.add_argument("--container", default=None, help="Sample this container with get_container_stats.py during each trial")
+    p.add_argument("--out-dir", default="benchmark_results", help="Output directory (default: benchmark_results)")
+    p.add_argument("--extra", nargs="*", default=[], help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+    if args.matrix:
+        with open(args.matrix) as f:
+            p.set_defaults(**{key.replace("-", "_"): value for key, value in json.load(f).items()})
+        args = p.parse_args(argv)
+    # Arguments after "--" go to every test_speed.py run, after any from the matrix file
+    args.extra = list(args.extra) + extra
+    if args.read_pool and not args.server_setup:
+        p.error("--read-pool needs --server-setup to restart the server with each size")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    cells = []
+    started = time.time()
+    for host in args.hosts:
+        for read_pool in args.read_pool or [None]:
+            if args.server_setup:
+                setup_server(args, host, read_pool)
+            for write_pct in args.write_pct:
+                for concurrency in args.concurrency:
+                    cells.append(run_cell(args, host, concurrency, write_pct, read_pool))
+    knees = find_knees(cells)
+
+    results = {
+        "started": started,
+        "finished": time.time(),
+        "matrix": {
+            "hosts": args.hosts,
+            "concurrency": args.concurrency,
+            "write_pct": args.write_pct,
+            "read_pool": args.read_pool,
+            "duration": args.duration,
+            "trials": args.trials,
+            "container": args.container,
+            "extra": args.extra,
+        },
+        "cells": cells,
+        "knees": knees,
+    }
+    with open(os.path.join(args.out_dir, "results.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    write_summary_csv(cells, os.path.join(args.out_dir, "summary.csv"))
+
+    print("\n=== Summary ===")
+    for cell in cells:
+        average = cell["average"]
+        if average is None:
+            print(f"{cell['name']}: no successful trials")
+            continue
+        print(f"{cell['name']}: {average['throughput']:.2f} ops/s, read p99 {average['read_p99_ms']:.2f} ms, "
+              f"write p99 {average['write_p99_ms']:.2f} ms")
+    for knee in knees:
+        pool_note = f" read_pool={knee['read_pool']}" if knee["read_pool"] is not None else ""
+        print(f"\nKnee for {knee['host']} write_pct={knee['write_pct']}{pool_note}: concurrency {knee['knee_concurrency']} "
+              f"({knee['knee_throughput']:.2f} ops/s, read p99 {knee['knee_read_p99_ms']:.2f} ms); "
+              f"peak {knee['peak_throughput']:.2f} ops/s at concurrency {knee['peak_concurrency']}")
+    print(f"\nResults written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
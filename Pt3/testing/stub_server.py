@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the FitHealth server, for testing and calibrating the load
+generator without a deployed VM.
+
+Serves the same contract as the Express service: POST /records (one record or
+an array), GET /records/:user_id, POST /records/multi-get and the
+GET /records?from=&to=&limit= range query, with the same status codes and
+response bodies. Records live in an in-memory dict. --latency injects a
+per-request delay drawn from a distribution, to stand in for server time.
+
+Serve over HTTP, or HTTPS with --https (a self-signed certificate is generated
+with openssl unless --cert/--key are given):
+    python stub_server.py --port 8080 --latency exp:2
+    python test_speed.py --base-url http://127.0.0.1:8080 --duration 30
+
+--calibrate starts a stub (with no injected latency unless --latency is
+given) and drives it with test_speed.py at increasing concurrency, reporting
+the client's latency floor and the highest throughput it can sustain. Both run on this machine, so the
+numbers are a lower bound on what the client alone could do.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from aiohttp import web
+from latency_stats import LatencyStats
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEST_SPEED = os.path.join(HERE, "test_speed.py")
+REQUIRED_FIELDS = ("user_id", "timestamp", "heart_rate", "blood_pressure")
+RANGE_DEFAULT_LIMIT = 100
+RANGE_MAX_LIMIT = 5000
+
+
+# --- Injected Latency ---
+def parse_latency(spec):
+    """
+    Parse DIST:PARAMS (ms) into a sampler returning seconds, or None for no delay:
+    fixed:MEAN, uniform:LOW:HIGH, exp:MEAN, lognormal:MEDIAN:SIGMA.
+    """
+    if not spec:
+        return None
+    name, *params = spec.split(":")
+    params = [float(p) for p in params]
+    samplers = {
+        "fixed": (1, lambda mean: mean),
+        "uniform": (2, lambda low, high: random.uniform(low, high)),
+        "exp": (1, lambda mean: random.expovariate(1 / mean) if mean > 0 else 0.0),
+        "lognormal": (2, lambda median, sigma: random.lognormvariate(0, sigma) * median),
+    }
+    if name not in samplers or len(params) != samplers[name][0]:
+        raise argparse.ArgumentTypeError(f"invalid latency spec {spec!r}; use fixed:MS, uniform:LOW:HIGH, exp:MEAN or lognormal:MEDIAN:SIGMA")
+    sample = samplers[name][1]
+    return lambda: max(0.0, sample(*params)) / 1000
+
+
+# --- Server ---
+def serialize(record):
+    """Shape a record the way the Express service returns it; notes come back as a Buffer."""
+    notes = record.get("notes")
+    if isinstance(notes, str):
+        notes = {"type": "Buffer", "data": list(notes.encode())}
+    return json.dumps({
+        "user_id": record["user_id"],
+        "timestamp": record["timestamp"],
+        "heart_rate": record["heart_rate"],
+        "blood_pressure": record["blood_pressure"],
+        "notes": notes,
+    }, separators=(",", ":"))
+
+
+def build_app(latency=None):
+    # user_id -> (timestamp, serialized body); bodies are built on write so reads only look up
+    store = {}
+
+    async def delay():
+        if latency is not None:
+            await asyncio.sleep(latency())
+
+    def put(record):
+        store[record["user_id"]] = (record["timestamp"], serialize(record))
+
+    async def insert(request):
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return web.json_response({"message": "Invalid JSON"}, status=400)
+        await delay()
+        if isinstance(body, list):
+            if not body:
+                return web.json_response({"message": "Request body must be a non-empty array of records."}, status=400)
+            for record in body:
+                put(record)
+            return web.json_response({"message": "Batch insert successful", "count": len(body)}, status=201)
+        if any(body.get(field) in (None, "") for field in REQUIRED_FIELDS):
+            return web.json_response({"message": "Missing required fields: user_id, timestamp, heart_rate, blood_pressure"}, status=400)
+        put(body)
+        return web.json_response({"message": "Record inserted or updated successfully", "userId": body["user_id"]}, status=201)
+
+    async def get_record(request):
+        await delay()
+        entry = store.get(request.match_info["user_id"])
+        if entry is None:
+            return web.json_response({"message": "Record not found"}, status=404)
+        return web.Response(text=entry[1], content_type="application/json")
+
+    async def multi_get(request):
+        body = await request.json()
+        user_ids = body.get("user_ids") if isinstance(body, dict) else None
+        if not isinstance(user_ids, list) or not user_ids:
+            return web.json_response({"message": "Request body must be {\"user_ids\": [...]}"}, status=400)
+        await delay()
+        lines = [store[user_id][1] for user_id in user_ids if user_id in store]
+        return web.Response(text="".join(line + "\n" for line in lines), content_type="application/x-ndjson")
+
+    async def range_query(request):
+        try:
+            low = int(request.query.get("from", 0))
+            high = int(request.query.get("to", sys.maxsize))
+            limit = min(int(request.query.get("limit", RANGE_DEFAULT_LIMIT)), RANGE_MAX_LIMIT)
+        except ValueError:
+            return web.json_response({"message": "Query must be ?from=&to=&limit= with integer values"}, status=400)
+        after = None
+        if "after_timestamp" in request.query:
+            after = (int(request.query["after_timestamp"]), request.query.get("after_user_id", ""))
+        await delay()
+        # A linear scan; fine for a stand-in, and it keeps writes O(1)
+        rows = sorted(
+            (timestamp, user_id, body) for user_id, (timestamp, body) in store.items()
+            if low <= timestamp < high and (after is None or (timestamp, user_id) > after)
+        )[:limit]
+        return web.Response(text="".join(body + "\n" for _, _, body in rows), content_type="application/x-ndjson")
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.add_routes([
+        web.post("/records", insert),
+        web.post("/records/multi-get", multi_get),
+        web.get("/records", range_query),
+        web.get("/records/{user_id}", get_record),
+    ])
+    return app
+
+
+def self_signed_context(cert=None, key=None):
+    """SSL context from cert/key, or from a throwaway self-signed pair made with openssl."""
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    if cert is None:
+        tmp = tempfile.mkdtemp(prefix="stub_server_")
+        cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def serve(args):
+    ssl_context = self_signed_context(args.cert, args.key) if args.https else None
+    scheme = "https" if ssl_context else "http"
+    print(f"Stub FitHealth server on {scheme}://{args.host}:{args.port} (latency: {args.latency or 'none'})", flush=True)
+    web.run_app(build_app(parse_latency(args.latency)), host=args.host, port=args.port,
+                ssl_context=ssl_context, print=None, access_log=None)
+
+
+# --- Calibration ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"stub server did not start on port {port}")
+
+
+def calibrate(args, extra):
+    port = free_port()
+    scheme = "https" if args.https else "http"
+    server_cmd = [sys.executable, os.path.abspath(__file__), "--host", "127.0.0.1", "--port", str(port)]
+    if args.https:
+        server_cmd.append("--https")
+    if args.latency:
+        server_cmd += ["--latency", args.latency]
+    server = subprocess.Popen(server_cmd, stdout=subprocess.DEVNULL)
+    rows = []
+    try:
+        wait_for_port(port)
+        with tempfile.TemporaryDirectory(prefix="calibrate_") as tmp:
+            for i, concurrency in enumerate(args.concurrency):
+                hist_path = os.path.join(tmp, f"c{concurrency}.json")
+                cmd = [sys.executable, TEST_SPEED, "--base-url", f"{scheme}://127.0.0.1:{port}",
+                       "--duration", str(args.duration), "--concurrency", str(concurrency),
+                       "--initial-records", str(args.records), "--save-histograms", hist_path] + extra
+                if i == 0:
+                    cmd += ["--initial-load", "--batch-size", "1000"]
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, cwd=HERE)
+                stats, meta = LatencyStats.load(hist_path)
+                hist = stats.histogram(["mixed_read", "mixed_write", "mixed_batch_write", "multi_read", "range_read"])
+                ops_per_sec = meta["mixed_ops"] / meta["mixed_duration"] if meta.get("mixed_duration") else 0.0
+                rows.append((concurrency, ops_per_sec, hist.percentile(50), hist.percentile(99)))
+                print(f"concurrency {concurrency:>5}: {ops_per_sec:>10.2f} ops/s  p50 {rows[-1][2]:.2f} ms  p99 {rows[-1][3]:.2f} ms", flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+    floor = min(rows, key=lambda row: row[0])
+    peak = max(rows, key=lambda row: row[1])
+    print("\n=== Calibration ===")
+    print(f"Latency floor (concurrency {floor[0]}): p50 {floor[2]:.2f} ms, p99 {floor[3]:.2f} ms"
+          + (f" including injected {args.latency}" if args.latency else ""))
+    print(f"Max sustainable throughput: {peak[1]:.2f} ops/s at concurrency {peak[0]} (p99 {peak[3]:.2f} ms)")
+    print("Server throughput or latency near these numbers is limited by the client, not the server.")
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, extra = argv[:split], argv[split + 1:]
+    p = argparse.ArgumentParser(description="Local stand-in FitHealth server and load-generator calibration")
+    p.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    p.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    p.add_argument("--https", action="store_true", help="Serve HTTPS with --cert/--key or a generated self-signed certificate")
+    p.add_argument("--cert", default=None, help="TLS certificate (PEM) for --https")
+    p.add_argument("--key", default=None, help="TLS private key (PEM) for --https")
+    p.add_argument("--latency", default=None, help="Injected per-request latency in ms: fixed:MS, uniform:LOW:HIGH, exp:MEAN or lognormal:MEDIAN:SIGMA")
+    p.add_argument("--calibrate", action="store_true", help="Start a stub and sweep test_speed.py concurrency against it; arguments after -- go to test_speed.py")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128, 256], help="Concurrency levels for --calibrate (default: 1 8 32 128 256)")
+    p.add_argument("--duration", type=int, default=10, help="Seconds per calibration level (default: 10)")
+    p.add_argument("--records", type=int, default=10000, help="Records loaded before calibrating (default: 10000)")
+    args = p.parse_args(argv)
+    if (args.cert is None) != (args.key is None):
+        p.error("--cert and --key must be given together")
+    try:
+        parse_latency(args.latency)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        p.error(str(e))
+    if args.calibrate:
+        calibrate(args, extra)
+    else:
+        serve(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import requests
 import uuid
 import time
+import sys
 
-API_BASE_URL = "https://10.128.0.25/records"
+# Pass a server URL (e.g. http://127.0.0.1:8080 for stub_server.py) to test somewhere else
+API_BASE_URL = (sys.argv[1].rstrip("/") if len(sys.argv) > 1 else "https://10.128.0.25") + "/records"
 
 # Allow self-signed certificates
 REQUESTS_VERIFY = False
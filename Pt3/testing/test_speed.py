@@ -5,28 +5,171 @@ import time
 import uuid
 import os
 import json
+import itertools
 import subprocess
 import threading
-from collections import defaultdict
+import multiprocessing
+import queue
 import argparse
+import csv
+from latency_stats import LatencyStats, IntervalRecorder
+from workload_trace import TraceWriter, read_trace, merge_traces
 
 # --- Configuration ---
 parser = argparse.ArgumentParser(description="Test speed script")
 parser.add_argument("--ip", default="localhost", help="API server IP address (default: localhost)")
+parser.add_argument("--base-url", default=None, help="Server URL to test instead of https://IP, e.g. http://127.0.0.1:8080 for stub_server.py")
 parser.add_argument("--port", default="3000", help="API server port (default: 3000)")
 parser.add_argument("--duration", type=int, default=120, help="Test duration in seconds (default: 120)")
 parser.add_argument("--initial-load", action="store_true", help="If set, perform initial record creation (writes)")
+parser.add_argument("--initial-records", type=int, default=10000, help="Number of records created by --initial-load (default: 10000)")
+parser.add_argument("--batch-size", type=int, default=0, help="Load initial records in array POSTs of this many records (default: 0, single writes)")
+parser.add_argument("--batch-concurrency", type=int, default=8, help="Batched initial-load requests in flight (default: 8)")
+parser.add_argument("--payload-pool", type=int, default=0, help="Pre-serialize this many write bodies before the run and reuse them (default: 0, build each body per request)")
+parser.add_argument("--concurrency", type=int, default=200, help="Mixed-workload requests in flight, split across --workers (default: 200)")
+parser.add_argument("--pool-limit", type=int, default=0, help="Client connection pool size per worker (default: 0, sized to the in-flight limit so requests never queue for a socket)")
+parser.add_argument("--pool-limit-per-host", type=int, default=0, help="Connections per host (default: 0, same as --pool-limit)")
+parser.add_argument("--keepalive-timeout", type=float, default=30.0, help="Seconds an idle pooled connection is kept open (default: 30)")
+parser.add_argument("--force-close", action="store_true", help="Open a new connection, and TLS handshake, for every request")
+parser.add_argument("--workers", type=int, default=1, help="Number of load-generator processes; each runs a shard of the keyspace and concurrency (default: 1)")
+parser.add_argument("--rate", type=float, default=None, help="Open-loop target rate in ops/sec for the mixed workload (default: closed-loop)")
+parser.add_argument("--arrival", choices=["fixed", "poisson", "stepped"], default="fixed", help="Open-loop arrival process (default: fixed)")
+parser.add_argument("--rate-steps", default=None, help="Stepped open-loop schedule as RATE:SECONDS,... e.g. 500:30,1000:30,1500:60")
+parser.add_argument("--workload", default=None, help="JSON file of option defaults for the workload, e.g. {\"key_dist\": \"zipfian\", \"write_pct\": 0.2}; command-line flags override it")
+parser.add_argument("--keyspace", type=int, default=None, help="Number of user_ids the mixed workload draws from (default: --initial-records)")
+parser.add_argument("--key-dist", choices=["uniform", "zipfian", "hotspot", "latest"], default="uniform", help="Key distribution for the mixed workload (default: uniform)")
+parser.add_argument("--zipf-theta", type=float, default=0.99, help="Skew of the zipfian and latest distributions (default: 0.99)")
+parser.add_argument("--hotspot-keys", type=float, default=0.2, help="Fraction of the keyspace that is hot for --key-dist hotspot (default: 0.2)")
+parser.add_argument("--hotspot-ops", type=float, default=0.8, help="Fraction of operations that go to the hot keys for --key-dist hotspot (default: 0.8)")
+parser.add_argument("--write-pct", type=float, default=0.10, help="Fraction of mixed operations that are single-record writes (default: 0.10)")
+parser.add_argument("--batch-pct", type=float, default=0.0, help="Fraction of mixed operations that are array POSTs (default: 0.0); the rest are reads")
+parser.add_argument("--batch-ops-size", type=int, default=10, help="Records per array POST in the mixed workload (default: 10)")
+parser.add_argument("--multi-read-pct", type=float, default=0.0, help="Fraction of mixed operations that are multi-get reads of --multi-read-size user_ids (default: 0.0)")
+parser.add_argument("--multi-read-size", type=int, default=20, help="user_ids per multi-get read (default: 20)")
+parser.add_argument("--range-read-pct", type=float, default=0.0, help="Fraction of mixed operations that are timestamp-range reads (default: 0.0)")
+parser.add_argument("--range-read-window", type=int, default=3600, help="Seconds of record timestamps each range read covers (default: 3600)")
+parser.add_argument("--range-read-limit", type=int, default=100, help="Maximum records per range read (default: 100)")
+parser.add_argument("--key-samples", type=int, default=1 << 20, help="Number of precomputed (operation, key) samples the mixed workload cycles through (default: 1048576)")
+parser.add_argument("--timeseries", default=None, help="Write per-interval throughput, errors and p50/p99 per op type to this CSV")
+parser.add_argument("--timeseries-interval", type=float, default=1.0, help="Time-series window in seconds (default: 1.0)")
+parser.add_argument("--group-commit", choices=["server", "on", "off"], default="server", help="Ask the server to group-commit single-record writes (on), commit each one (off), or use its default (server)")
+parser.add_argument("--compare-group-commit", action="store_true", help="Run the test with group commit off and then on, and compare write throughput and latency")
+parser.add_argument("--slo-search", action="store_true", help="Find the highest open-loop rate that meets --slo-p99-ms and --slo-error-rate: double the rate each step until it fails, then bisect")
+parser.add_argument("--slo-p99-ms", type=float, default=100.0, help="p99 latency target for --slo-search, in ms (default: 100)")
+parser.add_argument("--slo-error-rate", type=float, default=0.01, help="Highest fraction of failed requests --slo-search accepts (default: 0.01)")
+parser.add_argument("--slo-ops", nargs="+", default=["mixed_read"], help="Op types whose p99 --slo-search holds to the target (default: mixed_read)")
+parser.add_argument("--search-start-rate", type=float, default=100.0, help="First rate --slo-search tries, in ops/sec (default: 100)")
+parser.add_argument("--search-warmup", type=float, default=2.0, help="Seconds each search step runs before its measurement window (default: 2)")
+parser.add_argument("--search-window", type=float, default=5.0, help="Seconds each search step is measured for (default: 5)")
+parser.add_argument("--search-min-requests", type=int, default=500, help="Lengthen a step's window at low rates until it holds this many requests, so its p99 means something (default: 500)")
+parser.add_argument("--search-precision", type=float, default=0.05, help="Stop bisecting once the failing rate is within this fraction of the passing rate (default: 0.05)")
+parser.add_argument("--search-max-steps", type=int, default=20, help="Most steps --slo-search runs (default: 20)")
+parser.add_argument("--search-out", default=None, help="Write each --slo-search step (rate, throughput, percentiles, errors, pass/fail) to this CSV")
+parser.add_argument("--progress", action="store_true", help="Print a live line per --progress-interval during the mixed workload: ops/sec, p50/p99, errors and requests in flight")
+parser.add_argument("--progress-interval", type=float, default=1.0, help="Window in seconds for --progress, --warmup auto and --early-stop (default: 1.0)")
+parser.add_argument("--warmup", default="0", help="Leave the start of the mixed workload out of the reported stats: a number of seconds, or auto to detect a transient of up to 60 seconds (MSER) (default: 0)")
+parser.add_argument("--early-stop", type=float, default=None, help="End the mixed workload before --duration once the 95%% confidence intervals of throughput and p99 after warmup are within this fraction of their means, e.g. 0.05")
+parser.add_argument("--cache-stats", action="store_true", help="Fetch the server's record-cache counters before and after the run and report the difference")
+parser.add_argument("--trace-phases", action="store_true", help="Trace each request with aiohttp and report connection-queue, DNS, connect+TLS, time-to-first-byte and body percentiles per op type")
+parser.add_argument("--record-trace", default=None, help="Write every mixed-workload request (op, key, body size, send time) to this binary trace file")
+parser.add_argument("--replay", default=None, help="Replay a trace from --record-trace or workload_trace.py convert as the mixed workload, open-loop on its send times, instead of generating one")
+parser.add_argument("--replay-speed", type=float, default=1.0, help="Time scale for --replay: 2 sends the trace twice as fast, 0.5 at half speed (default: 1.0)")
+parser.add_argument("--save-histograms", default=None, help="Write the run's latency histograms to this JSON file")
+parser.add_argument("--merge-histograms", nargs="+", default=None, help="Merge histogram files from earlier runs and report them instead of running a test")
+parser.add_argument("--late-threshold-ms", type=float, default=1.0, help="Open-loop sends issued later than this after their scheduled time count as late (default: 1.0)")
+
+def workload_defaults(path):
+    """
+    Read a --workload file into parser defaults, checking each entry the way
+    the command line would: unknown options, bad types and values outside
+    choices are errors rather than silently ignored.
+    """
+    actions = {action.dest: action for action in parser._actions}
+    with open(path) as f:
+        entries = json.load(f)
+    defaults = {}
+    for key, value in entries.items():
+        action = actions.get(key.replace("-", "_"))
+        if action is None or action.dest in ("help", "workload"):
+            parser.error(f"--workload {path}: unknown option {key!r}")
+        if action.nargs == 0:
+            # store_true flags take a JSON boolean
+            if not isinstance(value, bool):
+                parser.error(f"--workload {path}: {key} must be true or false")
+            defaults[action.dest] = value
+            continue
+        many = action.nargs in ("+", "*")
+        if many != isinstance(value, list):
+            parser.error(f"--workload {path}: {key} must be {'a list' if many else 'a single value'}")
+        converted = []
+        for item in value if many else [value]:
+            try:
+                item = action.type(str(item)) if action.type else str(item)
+            except (TypeError, ValueError):
+                parser.error(f"--workload {path}: invalid {key} value {item!r}")
+            if action.choices is not None and item not in action.choices:
+                parser.error(f"--workload {path}: {key} must be one of {', '.join(map(str, action.choices))}, not {item!r}")
+            converted.append(item)
+        defaults[action.dest] = converted if many else converted[0]
+    return defaults
+
 args, _ = parser.parse_known_args()
+if args.workload:
+    # The workload file supplies defaults; anything given on the command line still wins
+    parser.set_defaults(**workload_defaults(args.workload))
+    args, _ = parser.parse_known_args()
+if min(args.write_pct, args.batch_pct, args.multi_read_pct, args.range_read_pct) < 0 or args.write_pct + args.batch_pct + args.multi_read_pct + args.range_read_pct > 1:
+    parser.error("--write-pct, --batch-pct, --multi-read-pct and --range-read-pct must be non-negative and sum to at most 1")
+if args.rate is not None and args.rate <= 0:
+    parser.error("--rate must be positive")
+if args.rate_steps:
+    for step in args.rate_steps.split(","):
+        try:
+            step_rate, step_seconds = (float(value) for value in step.split(":"))
+        except ValueError:
+            parser.error(f"--rate-steps entry {step!r} is not RATE:SECONDS")
+        if step_rate <= 0 or step_seconds <= 0:
+            parser.error(f"--rate-steps entry {step!r} needs a positive rate and duration")
+    args.arrival = "stepped"
+elif args.arrival == "stepped":
+    parser.error("--arrival stepped requires --rate-steps")
+if args.replay and (args.rate is not None or args.rate_steps):
+    parser.error("--replay sends on the trace's schedule; it cannot be combined with --rate or --rate-steps")
+if args.replay_speed <= 0:
+    parser.error("--replay-speed must be positive")
+if args.slo_search and (args.rate is not None or args.rate_steps or args.replay or args.workers > 1 or args.compare_group_commit):
+    parser.error("--slo-search sets the rate itself and runs in one process; drop --rate, --rate-steps, --replay, --workers and --compare-group-commit")
+if args.warmup != "auto":
+    try:
+        args.warmup = float(args.warmup)
+    except ValueError:
+        parser.error("--warmup must be a number of seconds or auto")
+    if args.warmup >= args.duration and not (args.replay or args.slo_search):
+        parser.error("--warmup must be shorter than --duration")
+if args.early_stop is not None and args.early_stop <= 0:
+    parser.error("--early-stop must be positive")
+REPLAY = args.replay is not None
+OPEN_LOOP = args.rate is not None or args.arrival == "stepped" or REPLAY
 
-API_BASE_URL = f"https://{args.ip}/records"
-INITIAL_RECORDS_TO_LOAD = 10000
-WRITE_PERCENTAGE = 0.10 # 10% writes
-MAX_CONCURRENT_REQUESTS = 200 # Adjust based on your server's capacity and client machine
+SERVER_URL = args.base_url.rstrip("/") if args.base_url else f"https://{args.ip}"
+API_BASE_URL = f"{SERVER_URL}/records"
+CACHE_STATS_URL = f"{SERVER_URL}/stats/cache"
+INITIAL_RECORDS_TO_LOAD = args.initial_records
+WRITE_PERCENTAGE = args.write_pct # 10% writes by default
+BATCH_PERCENTAGE = args.batch_pct
+MULTI_READ_PERCENTAGE = args.multi_read_pct
+RANGE_READ_PERCENTAGE = args.range_read_pct
+READ_PERCENTAGE = 1 - WRITE_PERCENTAGE - BATCH_PERCENTAGE - MULTI_READ_PERCENTAGE - RANGE_READ_PERCENTAGE
+RECORD_AGE_MAX = 86400 * 30 # generate_record_data backdates timestamps by up to 30 days
+KEYSPACE_SIZE = args.keyspace or INITIAL_RECORDS_TO_LOAD
+MAX_CONCURRENT_REQUESTS = args.concurrency # Adjust based on your server's capacity and client machine
 INITIAL_WRITE_CONCURRENCY = 200  # Lower concurrency for initial writes
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 # --- Data Generation ---
 def generate_random_string(length=10):
-    return ''.join(random.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(length))
+    return ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=length))
 
 def generate_record_data(user_id=None):
     if user_id is None:
@@ -35,88 +178,475 @@ def generate_record_data(user_id=None):
     notes_content = os.urandom(notes_length_bytes).hex()
     return {
         "user_id": user_id,
-        "timestamp": int(time.time()) - random.randint(0, 86400 * 30),
+        "timestamp": int(time.time()) - random.randint(0, RECORD_AGE_MAX),
         "heart_rate": random.randint(50, 120),
         "blood_pressure": f"{random.randint(90, 140)}/{random.randint(60, 90)}",
         "notes": notes_content
     }
 
-async def make_request(session, method, url, data=None, operation_type="unknown"):
+def sized_record(user_id, size):
+    """A record whose JSON body is about size bytes, for replaying a traced write."""
+    record = generate_record_data(user_id=user_id)
+    record["notes"] = ""
+    pad = size - len(json.dumps(record))
+    if pad > 0:
+        record["notes"] = os.urandom(pad // 2).hex()
+    return record
+
+def build_payload_pool(size):
+    """
+    Pre-serialize size records for --payload-pool. Each entry is the record's
+    timestamp age plus the JSON bytes that follow the timestamp, so a request
+    body only needs the user_id and current time spliced in.
+    """
+    pool = []
+    now = int(time.time())
+    for _ in range(size):
+        record = generate_record_data(user_id="")
+        age = now - record.pop("timestamp")
+        del record["user_id"]
+        tail = b"," + json.dumps(record, separators=(",", ":")).encode()[1:]
+        pool.append((age, tail))
+    return pool
+
+def pooled_record(entry, user_id):
+    age, tail = entry
+    return b'{"user_id":"' + user_id.encode() + b'","timestamp":' + str(int(time.time()) - age).encode() + tail
+
+# --- Workload Sampling ---
+def sample_key_ranks(n, k):
+    """
+    Draw k key ranks in [0, n) from the --key-dist distribution. Rank 0 is the
+    hottest key for zipfian and hotspot; latest maps ranks onto the most
+    recently loaded (highest-numbered) user_ids instead.
+    """
+    if args.key_dist in ("zipfian", "latest"):
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) ** args.zipf_theta for rank in range(n)))
+        ranks = random.choices(range(n), cum_weights=cum_weights, k=k)
+        if args.key_dist == "latest":
+            ranks = [n - 1 - rank for rank in ranks]
+        return ranks
+    if args.key_dist == "hotspot" and n > 1:
+        hot = max(1, min(n - 1, int(n * args.hotspot_keys)))
+        return [
+            random.randrange(hot) if random.random() < args.hotspot_ops else random.randrange(hot, n)
+            for _ in range(k)
+        ]
+    return [random.randrange(n) for _ in range(k)]
+
+def build_workload(keys):
+    """
+    Precompute --key-samples (operation, key) pairs for the mixed workload so the
+    hot loop only walks two lists.
+    """
+    ops = random.choices(
+        ["read", "write", "batch", "multi", "range"],
+        weights=[READ_PERCENTAGE, WRITE_PERCENTAGE, BATCH_PERCENTAGE, MULTI_READ_PERCENTAGE, RANGE_READ_PERCENTAGE],
+        k=args.key_samples,
+    )
+    sampled_keys = [keys[rank] for rank in sample_key_ranks(len(keys), args.key_samples)]
+    return ops, sampled_keys
+
+# --- Open-Loop Arrivals ---
+def parse_rate_steps(spec):
+    """Parse 'RATE:SECONDS,...' into a list of (rate, seconds) tuples."""
+    steps = []
+    for part in spec.split(","):
+        rate, seconds = part.split(":")
+        steps.append((float(rate), float(seconds)))
+    return steps
+
+def arrival_offsets(duration, shard_index=0, shard_count=1):
+    """
+    Yield the scheduled send time of each open-loop request, in seconds from the
+    start of the mixed workload. The last step of a stepped schedule is held
+    until the duration runs out. When the load is sharded, each shard takes
+    every shard_count-th slot of the fixed/stepped schedule (or a 1/shard_count
+    Poisson stream), so the shards together produce the requested rate.
+    """
+    if args.arrival == "stepped":
+        steps = parse_rate_steps(args.rate_steps)
+        step_start = 0.0
+        for i, (rate, seconds) in enumerate(steps):
+            step_end = duration if i == len(steps) - 1 else min(step_start + seconds, duration)
+            n = shard_index
+            t = step_start + n / rate
+            while t < step_end:
+                yield t
+                n += shard_count
+                t = step_start + n / rate
+            step_start = step_end
+            if step_start >= duration:
+                return
+    elif args.arrival == "poisson":
+        rate = args.rate / shard_count
+        t = random.expovariate(rate)
+        while t < duration:
+            yield t
+            t += random.expovariate(rate)
+    else:
+        n = shard_index
+        t = n / args.rate
+        while t < duration:
+            yield t
+            n += shard_count
+            t = n / args.rate
+
+# --- SLO Throughput Search ---
+SEARCH_MIN_RATE = 1.0
+SEARCH_FIELDS = ["step", "rate", "throughput", "requests", "errors", "error_rate", "p50_ms", "p95_ms", "p99_ms", "passed"]
+
+class ThroughputSearch:
+    """
+    Picks the offered rate for each --slo-search step: doubles it from the start
+    rate until a step misses the SLO, then bisects between the highest passing
+    and lowest failing rates until they are within precision of each other.
+    """
+
+    def __init__(self, start_rate, precision, max_steps):
+        self.rate = start_rate
+        self.precision = precision
+        self.max_steps = max_steps
+        self.steps = 0
+        self.passed = None
+        self.failed = None
+
+    def record(self, passed):
+        self.steps += 1
+        if passed:
+            self.passed = self.rate
+        else:
+            self.failed = self.rate
+        if self.failed is None:
+            self.rate *= 2
+        elif self.passed is None:
+            self.rate /= 2
+        else:
+            self.rate = (self.passed + self.failed) / 2
+
+    @property
+    def done(self):
+        if self.steps >= self.max_steps:
+            return True
+        if self.passed is None:
+            return self.failed is not None and self.rate < SEARCH_MIN_RATE
+        return self.failed is not None and self.failed - self.passed <= self.precision * self.passed
+
+def search_step_row(step, rate, window, seconds):
+    """Summarize one search step's measurement window and check it against the SLO."""
+    op_types = window.op_types()
+    requests = window.histogram(op_types).count
+    errors = requests - sum(window.count(op_type, "2xx") for op_type in op_types)
+    slo_hist = window.histogram([op_type for op_type in args.slo_ops if op_type in op_types])
+    p50, p95, p99 = slo_hist.percentiles((50, 95, 99)).values() if slo_hist.count else (0.0, 0.0, 0.0)
+    error_rate = errors / requests if requests else 1.0
+    return {
+        "step": step,
+        "rate": rate,
+        "throughput": (requests - errors) / seconds if seconds else 0.0,
+        "requests": requests,
+        "errors": errors,
+        "error_rate": error_rate,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "passed": bool(slo_hist.count) and p99 <= args.slo_p99_ms and error_rate <= args.slo_error_rate,
+    }
+
+# --- Steady State ---
+STEADY_BATCH_WINDOWS = 3 # windows per batch mean for the --early-stop confidence intervals
+STEADY_MIN_BATCHES = 8
+STEADY_MAX_WARMUP_S = 60 # longest transient --warmup auto can cut; bounds the windows held back
+T_95 = 1.96
+
+def mser_truncation(values, limit=None):
+    """
+    MSER warmup cut: the number of leading values to drop that minimizes the
+    standard error of the mean of the rest. Only the first half (and at most
+    limit values) is searched, so a series that never settles keeps at least
+    half its values.
+    """
+    n = len(values)
+    last = n // 2 if limit is None else min(n // 2, limit)
+    best, best_d = None, 0
+    # Walk d down from last keeping running sums of values[d:], so each cut is O(1).
+    # The sums are taken relative to the final value: a flat tail then scores
+    # exactly 0 and ties resolve to the shortest cut instead of rounding noise.
+    ref = values[-1]
+    total = sum(x - ref for x in values[last + 1:])
+    total_sq = sum((x - ref) ** 2 for x in values[last + 1:])
+    for d in range(last, -1, -1):
+        x = values[d] - ref
+        total += x
+        total_sq += x * x
+        m = n - d
+        score = (total_sq - total * total / m) / (m * m)
+        if best is None or score <= best:
+            best, best_d = score, d
+    return best_d
+
+def batch_mean_interval(values, batch):
+    """Mean and 95% confidence half-width of values, from means of consecutive batches."""
+    means = [sum(values[i:i + batch]) / batch for i in range(0, len(values) - batch + 1, batch)]
+    k = len(means)
+    mean = sum(means) / k
+    variance = sum((m - mean) ** 2 for m in means) / (k - 1)
+    return mean, T_95 * (variance / k) ** 0.5
+
+class SteadyStateTracker:
+    """
+    Mixed-workload results in fixed windows counted from the start of the
+    phase. Each closed window is reduced to its count and p99; windows the
+    warmup cut could still drop are held back whole, and every other window is
+    merged into stats as it closes, so memory stays bounded however long the
+    run is.
+    """
+
+    def __init__(self, interval_s, start_perf, stats, warmup):
+        self.interval_s = interval_s
+        self.start_perf = start_perf
+        self.stats = stats
+        self.auto = warmup == "auto"
+        self.max_cut = int(-(-(STEADY_MAX_WARMUP_S if self.auto else warmup) // interval_s))
+        self.open = {}
+        self.held = []
+        self.summaries = []
+
+    def current(self, now_perf):
+        # A result that lands just after its window was closed counts towards the next one
+        index = max(len(self.summaries), int((now_perf - self.start_perf) / self.interval_s))
+        window = self.open.get(index)
+        if window is None:
+            window = self.open[index] = LatencyStats()
+        return window
+
+    def close(self, n):
+        """Close the windows before n; returns the last one closed (or None)."""
+        window = None
+        for index in range(len(self.summaries), n):
+            window = self.open.pop(index, None) or LatencyStats()
+            hist = window.histogram(window.op_types())
+            self.summaries.append((hist.count, hist.percentile(99) if hist.count else 0.0))
+            if index < self.max_cut:
+                self.held.append(window)
+            else:
+                self.stats.merge(window)
+        return window
+
+    def series(self, n):
+        """Throughput (ops/sec) and p99 (ms) of each of the first n windows."""
+        self.close(n)
+        throughput = [summary[0] / self.interval_s for summary in self.summaries[:n]]
+        p99 = [summary[1] for summary in self.summaries[:n]]
+        return throughput, p99
+
+    def warmup_windows(self, n):
+        """
+        Windows to drop from the first n: the later of the throughput and p99
+        MSER cuts, or the fixed --warmup. At least one window is always kept.
+        """
+        if not self.auto:
+            return max(0, min(n - 1, self.max_cut))
+        if not n:
+            return 0
+        throughput, p99 = self.series(n)
+        return max(mser_truncation(throughput, self.max_cut), mser_truncation(p99, self.max_cut))
+
+    def converged(self, n, precision):
+        """True once throughput and p99 after warmup are both known to within precision."""
+        cut = self.warmup_windows(n)
+        if n - cut < STEADY_BATCH_WINDOWS * STEADY_MIN_BATCHES:
+            return False
+        for values in self.series(n):
+            mean, half_width = batch_mean_interval(values[cut:], STEADY_BATCH_WINDOWS)
+            if not mean or half_width > precision * mean:
+                return False
+        return True
+
+    def finish(self, cut):
+        """Merge everything after the first cut windows into stats; returns the operations dropped."""
+        self.close(max(self.open, default=-1) + 1)
+        for window in self.held[cut:]:
+            self.stats.merge(window)
+        self.held.clear()
+        return sum(summary[0] for summary in self.summaries[:cut])
+
+def decode_error_body(body):
+    try:
+        return json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return body[:200]
+
+def request_body(data):
+    # Pre-serialized (pooled) bodies are sent as-is; dicts are JSON-encoded by aiohttp
+    if isinstance(data, list) and data and isinstance(data[0], bytes):
+        data = b"[" + b",".join(data) + b"]"
+    if isinstance(data, bytes):
+        return {"data": data, "headers": JSON_HEADERS}
+    return {"json": data}
+
+def body_size(data):
+    body = request_body(data)
+    return len(body["data"]) if "data" in body else len(json.dumps(body["json"]).encode())
+
+# --- Connection Pool ---
+POOL_COUNTERS = "connection_pool"
+
+def build_connector(in_flight):
+    """
+    TCPConnector sized to the shard's in-flight limit, so requests wait on the
+    server rather than on the client for a free socket.
+    """
+    pool_limit = args.pool_limit or in_flight
+    options = {"limit": pool_limit, "limit_per_host": args.pool_limit_per_host or pool_limit}
+    if args.force_close:
+        options["force_close"] = True
+    else:
+        options["keepalive_timeout"] = args.keepalive_timeout
+    return aiohttp.TCPConnector(ssl=False, **options), pool_limit
+
+def build_pool_trace_config(target):
+    """
+    TraceConfig counting new and reused connections and the time requests
+    spend queued for a free one, as counters under POOL_COUNTERS in the
+    LatencyStats target() returns, so they land alongside the requests.
+    """
+    async def on_create_end(session, trace_config_ctx, params):
+        target().increment(POOL_COUNTERS, "new")
+
+    async def on_reuse(session, trace_config_ctx, params):
+        target().increment(POOL_COUNTERS, "reused")
+
+    async def on_queued_start(session, trace_config_ctx, params):
+        trace_config_ctx.queued_at = time.perf_counter()
+
+    async def on_queued_end(session, trace_config_ctx, params):
+        counters = target()
+        counters.increment(POOL_COUNTERS, "queued")
+        counters.increment(POOL_COUNTERS, "queue_ms", (time.perf_counter() - trace_config_ctx.queued_at) * 1000)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_create_end)
+    trace_config.on_connection_reuseconn.append(on_reuse)
+    trace_config.on_connection_queued_start.append(on_queued_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+    return trace_config
+
+# --- Request Phase Tracing ---
+TRACE_MARKS = {
+    "on_request_start": "request_start",
+    "on_connection_queued_start": "queued_start",
+    "on_connection_queued_end": "queued_end",
+    "on_connection_create_start": "create_start",
+    "on_connection_create_end": "create_end",
+    "on_dns_resolvehost_start": "dns_start",
+    "on_dns_resolvehost_end": "dns_end",
+    "on_request_headers_sent": "headers_sent",
+    "on_request_end": "request_end",
+}
+
+TRACE_PHASES = ("queue", "dns", "connect", "ttfb", "body")
+
+def build_trace_config():
+    """
+    aiohttp TraceConfig for --trace-phases. Each signal only stamps
+    perf_counter() into the dict passed as trace_request_ctx; request_phases()
+    turns the stamps into durations once the body has been read.
+    """
+    def stamp(mark):
+        async def on_signal(session, trace_config_ctx, params):
+            trace_config_ctx.trace_request_ctx[mark] = time.perf_counter()
+        return on_signal
+
+    trace_config = aiohttp.TraceConfig()
+    for signal_name, mark in TRACE_MARKS.items():
+        getattr(trace_config, signal_name).append(stamp(mark))
+    return trace_config
+
+def request_phases(marks, body_end):
+    """
+    Split a traced request into phases (ms). aiohttp opens TCP and TLS in one
+    create_connection call, so connect covers both; it and dns are only
+    present for requests that opened a new connection.
+    """
+    phases = {"queue": (marks["queued_end"] - marks["queued_start"]) * 1000 if "queued_end" in marks else 0.0}
+    dns = (marks["dns_end"] - marks["dns_start"]) * 1000 if "dns_end" in marks else 0.0
+    if "dns_end" in marks:
+        phases["dns"] = dns
+    if "create_end" in marks:
+        phases["connect"] = (marks["create_end"] - marks["create_start"]) * 1000 - dns
+    if "request_end" in marks:
+        sent = marks.get("headers_sent") or marks.get("create_end") or marks.get("queued_end") or marks["request_start"]
+        phases["ttfb"] = (marks["request_end"] - sent) * 1000
+        phases["body"] = (body_end - marks["request_end"]) * 1000
+    return phases
+
+async def make_request(session, method, url, data=None, operation_type="unknown", scheduled_at=None, ndjson=False):
+    # In open-loop mode latency is measured from the scheduled send time, so time
+    # spent waiting behind a stalled server is charged to the request
     start_time = time.perf_counter()
+    measured_from = scheduled_at if scheduled_at is not None else start_time
+    send_lag_ms = (start_time - scheduled_at) * 1000 if scheduled_at is not None else None
+    trace = {} if args.trace_phases else None
     try:
-        async with session.request(method, url, json=data) as response:
+        async with session.request(method, url, trace_request_ctx=trace, **request_body(data)) as response:
             end_time = time.perf_counter()
-            latency_ms = (end_time - start_time) * 1000
-            response_body = {}
-            try:
-                if response.content_type == 'application/json':
-                    response_body = await response.json()
-            except json.JSONDecodeError:
-                pass
-            except Exception:
-                pass
+            latency_ms = (end_time - measured_from) * 1000
+            # Always drain the body so the connection can be reused, but only decode it for errors
+            body = await response.read()
             # Print error details if not 2xx
             if not (200 <= response.status < 300):
                 print(f"Error from remote: {response.status} {response.reason} for {url}")
-                print(f"Response body: {response_body}")
+                print(f"Response body: {decode_error_body(body)}")
             return {
                 "type": operation_type,
                 "status": response.status,
                 "latency_ms": latency_ms,
-                "url": str(response.url),
-                "user_id": data.get("user_id") if data else url.split("/")[-1] if method == "GET" else None,
-                "response_body": response_body
+                "send_lag_ms": send_lag_ms,
+                "phases": request_phases(trace, time.perf_counter()) if trace is not None else None,
+                # NDJSON responses carry one record per line
+                "records": body.count(b"\n") if ndjson and 200 <= response.status < 300 else None
             }
     except aiohttp.ClientError as e:
         end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
+        latency_ms = (end_time - measured_from) * 1000
         print(f"ClientError during {operation_type} to {url}: {e}")
         return {
             "type": operation_type,
             "status": "ClientError",
             "latency_ms": latency_ms,
-            "url": url,
-            "user_id": data.get("user_id") if data else None,
-            "error": str(e)
+            "send_lag_ms": send_lag_ms
         }
     except Exception as e:
         end_time = time.perf_counter()
-        latency_ms = (end_time - start_time) * 1000
+        latency_ms = (end_time - measured_from) * 1000
         print(f"Unexpected error during {operation_type} to {url}: {e}")
         return {
             "type": operation_type,
             "status": "Exception",
             "latency_ms": latency_ms,
-            "url": url,
-            "user_id": data.get("user_id") if data else None,
-            "error": str(e)
+            "send_lag_ms": send_lag_ms
         }
 
 async def make_request_batch(session, url, data_list, operation_type="batch_initial_write"):
     start_time = time.perf_counter()
+    trace = {} if args.trace_phases else None
     try:
-        async with session.post(url, json=data_list) as response:
+        async with session.post(url, trace_request_ctx=trace, **request_body(data_list)) as response:
             end_time = time.perf_counter()
             latency_ms = (end_time - start_time) * 1000
-            response_body = {}
-            try:
-                if response.content_type == 'application/json':
-                    response_body = await response.json()
-            except json.JSONDecodeError:
-                pass
-            except Exception:
-                pass
+            body = await response.read()
             # Print error details if not 2xx
             if not (200 <= response.status < 300):
                 print(f"Error from remote (batch): {response.status} {response.reason} for {url}")
-                print(f"Response body: {response_body}")
+                print(f"Response body: {decode_error_body(body)}")
             return {
                 "type": operation_type,
                 "status": response.status,
                 "latency_ms": latency_ms,
-                "url": str(response.url),
+                "send_lag_ms": None,
                 "batch_size": len(data_list),
-                "response_body": response_body
+                "phases": request_phases(trace, time.perf_counter()) if trace is not None else None
             }
     except aiohttp.ClientError as e:
         end_time = time.perf_counter()
@@ -126,9 +656,8 @@ async def make_request_batch(session, url, data_list, operation_type="batch_init
             "type": operation_type,
             "status": "ClientError",
             "latency_ms": latency_ms,
-            "url": url,
-            "batch_size": len(data_list),
-            "error": str(e)
+            "send_lag_ms": None,
+            "batch_size": len(data_list)
         }
     except Exception as e:
         end_time = time.perf_counter()
@@ -138,175 +667,544 @@ async def make_request_batch(session, url, data_list, operation_type="batch_init
             "type": operation_type,
             "status": "Exception",
             "latency_ms": latency_ms,
-            "url": url,
-            "batch_size": len(data_list),
-            "error": str(e)
+            "send_lag_ms": None,
+            "batch_size": len(data_list)
         }
 
+def record_result(stats, result, series=None):
+    """Fold one request result into the run's histograms; the result dict itself is not kept."""
+    op_type = result["type"]
+    stats.record(op_type, result["status"], result["latency_ms"])
+    if series is not None:
+        series.record(op_type, result["status"], result["latency_ms"], time.time() * 1000)
+    if result.get("phases"):
+        for phase, phase_ms in result["phases"].items():
+            stats.record_phase(op_type, phase, phase_ms)
+    if result.get("records") is not None:
+        stats.increment(op_type, "records_read", result["records"])
+    if result["status"] == 409:
+        stats.increment(op_type, "conflicts")
+    if result["send_lag_ms"] is not None and result["send_lag_ms"] > args.late_threshold_ms:
+        stats.increment(op_type, "late")
+
+# --- Time Series ---
+class TimeSeriesWriter:
+    """
+    Writes closed IntervalRecorder windows to CSV: one row per op type plus an
+    'all' row per window. timestamp_ms is the window start in epoch ms, the
+    same clock docker stats dumps and get_container_stats.py use.
+    """
+    FIELDS = ["timestamp_ms", "interval_s", "op_type", "count", "errors", "ops_per_sec", "p50_ms", "p99_ms"]
+
+    def __init__(self, path, interval_s):
+        self.interval_s = interval_s
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.FIELDS)
+
+    def _row(self, start_ms, op_type, hist, errors):
+        return [start_ms, self.interval_s, op_type, hist.count, errors, f"{hist.count / self.interval_s:.2f}",
+                f"{hist.percentile(50):.3f}", f"{hist.percentile(99):.3f}"]
+
+    def write(self, start_ms, window):
+        op_types = window.op_types()
+        total_errors = 0
+        for op_type in op_types:
+            hist = window.histogram([op_type])
+            errors = hist.count - window.count(op_type, "2xx")
+            total_errors += errors
+            self.writer.writerow(self._row(start_ms, op_type, hist, errors))
+        self.writer.writerow(self._row(start_ms, "all", window.histogram(op_types), total_errors))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def collect_shard_windows(window_queue, workers, writer):
+    """
+    Merge the windows shards stream back and write each one once every shard
+    has moved past it. Runs in a thread in the parent until it receives None.
+    """
+    pending = {}
+    latest = [None] * workers
+    while True:
+        item = window_queue.get()
+        if item is None:
+            break
+        shard_index, start_ms, window = item
+        pending.setdefault(start_ms, LatencyStats()).merge(LatencyStats.from_dict(window))
+        latest[shard_index] = start_ms
+        if None not in latest:
+            done_through = min(latest)
+            for start in sorted(pending):
+                if start > done_through:
+                    break
+                writer.write(start, pending.pop(start))
+    for start in sorted(pending):
+        writer.write(start, pending[start])
+
 # --- Main Test Scenario ---
-async def run_test_scenario():
-    latencies = []
-    created_user_ids = []
-    initial_write_semaphore = asyncio.Semaphore(INITIAL_WRITE_CONCURRENCY)
-    mixed_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-
-    connector = aiohttp.TCPConnector(ssl=False)
-    async with aiohttp.ClientSession(connector=connector) as session:
-        # 1. Initial Data Loading (single writes)
+async def run_test_scenario(shard_index=0, shard_count=1, barrier=None, emit_window=None, search_results=None):
+    # With --workers each process runs one shard: every shard owns the user_ids
+    # with index % shard_count == shard_index and an equal slice of the concurrency
+    # budget (and open-loop rate). Given a search_results list, the mixed phase runs
+    # --slo-search steps instead and appends a search_step_row per step
+    stats = LatencyStats()
+    initial_concurrency = max(1, (args.batch_concurrency if args.batch_size else INITIAL_WRITE_CONCURRENCY) // shard_count)
+    mixed_concurrency = max(1, MAX_CONCURRENT_REQUESTS // shard_count)
+    initial_write_semaphore = asyncio.Semaphore(initial_concurrency)
+    mixed_semaphore = asyncio.Semaphore(mixed_concurrency)
+    shard_user_ids = [f"user_{i+1}" for i in range(shard_index, INITIAL_RECORDS_TO_LOAD, shard_count)]
+    # Keys are interleaved across shards, so shard-local rank r is global rank r * shard_count + shard_index
+    # and a skewed distribution over each shard's slice stays skewed overall
+    shard_keys = [f"user_{i+1}" for i in range(shard_index, KEYSPACE_SIZE, shard_count)]
+
+    def log(message):
+        if shard_count > 1:
+            message = message.replace("\n", f"\n[shard {shard_index}] ") if message.startswith("\n") else f"[shard {shard_index}] {message}"
+        print(message)
+
+    async def wait_for_shards():
+        # Block (off the event loop) until every shard reaches the same point
+        if barrier is not None:
+            await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    if args.payload_pool:
+        pool = build_payload_pool(args.payload_pool)
+        log(f"Built payload pool of {len(pool)} records ({sum(len(tail) for _, tail in pool) // 1024} KiB)")
+        payloads = itertools.cycle(pool)
+
+    workload_ops, workload_keys = build_workload(shard_keys)
+    workload_pos = 0
+
+    def new_record(user_id):
+        if args.payload_pool:
+            return pooled_record(next(payloads), user_id)
+        return generate_record_data(user_id=user_id)
+
+    series = IntervalRecorder(args.timeseries_interval) if emit_window is not None else None
+
+    async def emit_windows():
+        # Wake just after each window boundary and hand off the windows that closed
+        interval = args.timeseries_interval
+        while True:
+            await asyncio.sleep(interval - (time.time() % interval) + 0.001)
+            for start_ms, window in series.roll(time.time() * 1000):
+                emit_window(start_ms, window)
+
+    def stop_series():
+        if series is not None:
+            emitter.cancel()
+            for start_ms, window in series.flush():
+                emit_window(start_ms, window)
+
+    connector, pool_limit = build_connector(max(initial_concurrency, mixed_concurrency) if args.initial_load else mixed_concurrency)
+    log(f"Connection pool: {pool_limit} connections" + (", new connection per request" if args.force_close else f", keep-alive {args.keepalive_timeout:g}s"))
+    # Pool counters follow the mixed-phase windows, so a warmup cut drops them with its requests
+    tracker = None
+    trace_configs = [build_pool_trace_config(lambda: tracker.current(time.perf_counter()) if tracker else stats)]
+    if args.trace_phases:
+        trace_configs.append(build_trace_config())
+    headers = {"X-Group-Commit": args.group_commit} if args.group_commit != "server" else None
+    async with aiohttp.ClientSession(connector=connector, trace_configs=trace_configs, headers=headers) as session:
+        if series is not None:
+            emitter = asyncio.create_task(emit_windows())
+        # 1. Initial Data Loading (single writes, or array POSTs with --batch-size)
         if args.initial_load:
-            print(f"--- Starting Initial Data Load: {INITIAL_RECORDS_TO_LOAD} records (single writes, concurrency {INITIAL_WRITE_CONCURRENCY}) ---")
-            initial_load_tasks = []
+            await wait_for_shards()
             initial_start = time.time()
 
             # Generate incrementing user IDs
-            all_user_ids = [f"user_{i+1}" for i in range(INITIAL_RECORDS_TO_LOAD)]
-            created_user_ids = all_user_ids.copy()  # Save for mixed workload
-
-            async def single_write(user_id):
-                async with initial_write_semaphore:
-                    record = generate_record_data(user_id=user_id)
-                    result = await make_request(session, "POST", API_BASE_URL, data=record, operation_type="initial_write")
-                    return result
-
-            for user_id in all_user_ids:
-                task = asyncio.ensure_future(single_write(user_id))
-                initial_load_tasks.append(task)
-                if len(initial_load_tasks) % 1000 == 0:
-                    print(f"  Scheduled {len(initial_load_tasks)}/{INITIAL_RECORDS_TO_LOAD} records")
-
-            initial_results = await asyncio.gather(*initial_load_tasks)
-            initial_end = time.time()
-            initial_duration = initial_end - initial_start
-            for res in initial_results:
-                latencies.append(res)
-
-            total_created = sum(1 for res in initial_results if res["status"] == 201)
-            print(f"--- Initial Data Load Complete. {total_created} records successfully created. ---")
-            print(f"Initial write throughput: {total_created/initial_duration:.2f} ops/sec over {initial_duration:.2f} seconds")
+            all_user_ids = shard_user_ids
+
+            if args.batch_size:
+                log(f"--- Starting Initial Data Load: {len(all_user_ids)} records (batches of {args.batch_size}, concurrency {initial_concurrency}) ---")
+                batch_count = -(-len(all_user_ids) // args.batch_size)
+                batches_sent = 0
+
+                def record_batches():
+                    # Records are generated lazily, one batch at a time, as writers ask for them
+                    for i in range(0, len(all_user_ids), args.batch_size):
+                        yield [new_record(user_id) for user_id in all_user_ids[i:i + args.batch_size]]
+
+                async def batch_writer(batches):
+                    nonlocal batches_sent
+                    for batch in batches:
+                        result = await make_request_batch(session, API_BASE_URL, batch)
+                        record_result(stats, result, series)
+                        if isinstance(result["status"], int) and 200 <= result["status"] < 300:
+                            stats.increment(result["type"], "records", result["batch_size"])
+                        batches_sent += 1
+                        if batches_sent % max(1, batch_count // 10) == 0:
+                            log(f"  Sent {batches_sent}/{batch_count} batches")
+
+                # All writers pull from one generator, so each batch is sent exactly once
+                batches = record_batches()
+                await asyncio.gather(*(batch_writer(batches) for _ in range(initial_concurrency)))
+                initial_end = time.time()
+                initial_duration = initial_end - initial_start
+                total_created = stats.counters.get("batch_initial_write", {}).get("records", 0)
+            else:
+                log(f"--- Starting Initial Data Load: {len(all_user_ids)} records (single writes, concurrency {initial_concurrency}) ---")
+                initial_load_tasks = []
+
+                async def single_write(user_id):
+                    async with initial_write_semaphore:
+                        record = new_record(user_id)
+                        result = await make_request(session, "POST", API_BASE_URL, data=record, operation_type="initial_write")
+                        record_result(stats, result, series)
+
+                for user_id in all_user_ids:
+                    task = asyncio.ensure_future(single_write(user_id))
+                    initial_load_tasks.append(task)
+                    if len(initial_load_tasks) % 1000 == 0:
+                        log(f"  Scheduled {len(initial_load_tasks)}/{len(all_user_ids)} records")
+
+                await asyncio.gather(*initial_load_tasks)
+                initial_end = time.time()
+                initial_duration = initial_end - initial_start
+                total_created = stats.count("initial_write", "2xx")
+
+            log(f"--- Initial Data Load Complete. {total_created} records successfully created. ---")
+            log(f"Initial write throughput: {total_created/initial_duration:.2f} ops/sec over {initial_duration:.2f} seconds")
 
             if total_created == 0:
-                print("No records were created in the initial load. Aborting mixed workload.")
-                return latencies, total_created, initial_duration, 0, 0, total_created, initial_duration
+                log("No records were created in the initial load. Aborting mixed workload.")
+                if barrier is not None:
+                    barrier.abort()
+                stop_series()
+                return stats, total_created, initial_duration, 0, 0, total_created, initial_duration
         else:
-            # If not doing initial load, try to get user_ids from somewhere else or skip creation
-            print("--- Skipping Initial Data Load (no --initial-load flag) ---")
-            # Optionally, you could load user_ids from a file or another source here
-            created_user_ids = [f"user_{i+1}" for i in range(INITIAL_RECORDS_TO_LOAD)]
+            # If not doing initial load, assume the keyspace was loaded by an earlier run
+            log("--- Skipping Initial Data Load (no --initial-load flag) ---")
 
         # 2. Mixed Workload for a fixed duration (100 max in-flight requests)
-        print(f"\n--- Starting Mixed Workload: running for {args.duration} seconds (90% reads, max {MAX_CONCURRENT_REQUESTS} in flight) ---")
+        await wait_for_shards()
+        mix = f"{READ_PERCENTAGE:.0%} reads, {WRITE_PERCENTAGE:.0%} writes, {BATCH_PERCENTAGE:.0%} batches"
+        if MULTI_READ_PERCENTAGE or RANGE_READ_PERCENTAGE:
+            mix += f", {MULTI_READ_PERCENTAGE:.0%} multi-gets of {args.multi_read_size}, {RANGE_READ_PERCENTAGE:.0%} range reads"
+        mix += f"; {args.key_dist} keys over {KEYSPACE_SIZE} user_ids"
+        if search_results is not None:
+            log(f"\n--- Starting SLO Search: p99 of {', '.join(args.slo_ops)} <= {args.slo_p99_ms:g} ms, errors <= {args.slo_error_rate:.1%} ({mix}; max {mixed_concurrency} in flight) ---")
+        elif REPLAY:
+            log(f"\n--- Starting Mixed Workload: replaying {args.replay} at {args.replay_speed:g}x (max {mixed_concurrency} in flight) ---")
+        elif OPEN_LOOP:
+            schedule = f"{args.rate_steps} (stepped)" if args.arrival == "stepped" else f"{args.rate / shard_count:.0f} ops/sec ({args.arrival})"
+            if args.arrival == "stepped" and shard_count > 1:
+                schedule += f" / {shard_count} shards"
+            log(f"\n--- Starting Mixed Workload: running for {args.duration} seconds ({mix}; open-loop at {schedule}, max {mixed_concurrency} in flight) ---")
+        else:
+            log(f"\n--- Starting Mixed Workload: running for {args.duration} seconds ({mix}; max {mixed_concurrency} in flight) ---")
         mixed_workload_tasks = set()
-        mixed_results = []
+        completed = 0
         start_time = time.time()
         op_count = 0
+        late_count = 0
+        max_lag_ms = 0.0
+        start_perf = time.perf_counter()
+        # Results go straight into stats unless they are needed per window: for
+        # --progress, --early-stop, or to drop the --warmup windows at the end
+        tracker = None
+        if (search_results is None and (args.warmup or args.early_stop)) or args.progress:
+            tracker = SteadyStateTracker(args.progress_interval, start_perf, stats, args.warmup if search_results is None else 0)
+        stopping = False
+        # With --workers each shard records its own trace; run_sharded merges them
+        trace_writer = None
+        if args.record_trace:
+            trace_writer = TraceWriter(args.record_trace if shard_count == 1 else f"{args.record_trace}.{shard_index}")
 
         def on_done(task):
+            nonlocal completed, late_count, max_lag_ms
             try:
-                mixed_results.append(task.result())
+                result = task.result()
+                record_result(tracker.current(time.perf_counter()) if tracker else stats, result, series)
+                completed += 1
+                if result["send_lag_ms"] is not None:
+                    max_lag_ms = max(max_lag_ms, result["send_lag_ms"])
+                    if result["send_lag_ms"] > args.late_threshold_ms:
+                        late_count += 1
             except Exception:
                 pass
             mixed_workload_tasks.discard(task)
 
+        def take_keys(n):
+            nonlocal workload_pos
+            user_ids = []
+            for _ in range(n):
+                user_ids.append(workload_keys[workload_pos])
+                workload_pos = (workload_pos + 1) % len(workload_ops)
+            return user_ids
+
+        def next_request(scheduled_at=None, entry=None):
+            # A replayed entry fixes the op, and the keys and size when the trace has them;
+            # otherwise they come from the precomputed samples
+            if entry is not None:
+                op, key, size = entry.op, entry.key, entry.size
+            else:
+                op, key, size = workload_ops[workload_pos], "", 0
+            if op == "read":
+                user_id = key or take_keys(1)[0]
+                request = make_request(session, "GET", f"{API_BASE_URL}/{user_id}", operation_type="mixed_read", scheduled_at=scheduled_at)
+                key = user_id
+            elif op == "write":
+                user_id = key or take_keys(1)[0]
+                record = sized_record(user_id, size) if size else new_record(user_id)
+                request = make_request(session, "POST", API_BASE_URL, data=record, operation_type="mixed_write", scheduled_at=scheduled_at)
+                key = user_id
+                if trace_writer is not None and not size:
+                    size = body_size(record)
+            elif op == "multi":
+                user_ids = key.split(",") if key else take_keys(args.multi_read_size)
+                request = make_request(session, "POST", f"{API_BASE_URL}/multi-get", data={"user_ids": user_ids}, operation_type="multi_read", scheduled_at=scheduled_at, ndjson=True)
+                key = ",".join(user_ids)
+            elif op == "range":
+                if key:
+                    low, high = key.split(":")
+                    start = int(low)
+                    end = int(high) if high else start + args.range_read_window
+                else:
+                    # Range reads take no key, but still step past this sample
+                    take_keys(1)
+                    # A window somewhere in the span of timestamps the loaded records were given
+                    start = int(time.time()) - random.randint(args.range_read_window, max(args.range_read_window, RECORD_AGE_MAX))
+                    end = start + args.range_read_window
+                size = size or args.range_read_limit
+                url = f"{API_BASE_URL}?from={start}&to={end}&limit={size}"
+                request = make_request(session, "GET", url, operation_type="range_read", scheduled_at=scheduled_at, ndjson=True)
+                key = f"{start}:{end}"
+            else:
+                # Array POST of this key plus the next keys in the sample stream
+                user_ids = key.split(",") if key else take_keys(args.batch_ops_size)
+                if size:
+                    records = [sized_record(user_id, size // len(user_ids)) for user_id in user_ids]
+                else:
+                    records = [new_record(user_id) for user_id in user_ids]
+                request = make_request(session, "POST", API_BASE_URL, data=records, operation_type="mixed_batch_write", scheduled_at=scheduled_at)
+                key = ",".join(user_ids)
+                if trace_writer is not None and not size:
+                    size = body_size(records)
+            if trace_writer is not None:
+                trace_writer.write((scheduled_at if scheduled_at is not None else time.perf_counter()) - start_perf, op, key, size)
+            return request
+
+        async def watch_windows():
+            # Wake as each window closes: print the --progress line and check for an early stop
+            nonlocal stopping
+            closed = 0
+            while True:
+                await asyncio.sleep(max(0.0, start_perf + (closed + 1) * args.progress_interval - time.perf_counter()))
+                closed += 1
+                window = tracker.close(closed)
+                if args.progress:
+                    op_types = window.op_types()
+                    hist = window.histogram(op_types)
+                    errors = hist.count - sum(window.count(op_type, "2xx") for op_type in op_types)
+                    log(f"  [{closed * args.progress_interval:>6.1f}s] {hist.count / args.progress_interval:>9.1f} ops/s  "
+                        f"p50 {hist.percentile(50):>8.2f} ms  p99 {hist.percentile(99):>8.2f} ms  "
+                        f"errors {errors:>5}  in flight {len(mixed_workload_tasks):>5}")
+                if args.early_stop and search_results is None and tracker.converged(closed, args.early_stop):
+                    log(f"Early stop after {closed * args.progress_interval:.1f} seconds: throughput and p99 are within {args.early_stop:.0%} (95% confidence)")
+                    stopping = True
+                    return
+
+        watcher = asyncio.create_task(watch_windows()) if tracker else None
+
         async def schedule_next():
             nonlocal op_count
-            if time.time() - start_time >= args.duration:
+            if time.time() - start_time >= args.duration or stopping:
                 return
-            if random.random() < 0.9:  # 90% reads
-                random_user_id = random.choice(created_user_ids)
-                coro = make_request(session, "GET", f"{API_BASE_URL}/{random_user_id}", operation_type="mixed_read")
-            else:  # 10% writes
-                random_user_id = random.choice(created_user_ids)
-                record = generate_record_data(user_id=random_user_id)
-                coro = make_request(session, "POST", API_BASE_URL, data=record, operation_type="mixed_write")
-            task = asyncio.create_task(coro)
+            task = asyncio.create_task(next_request())
+            mixed_workload_tasks.add(task)
+            op_count += 1
+            task.add_done_callback(on_done)
+
+        async def scheduled_request(scheduled_at, entry=None):
+            # Requests queue here, not at the scheduler, when the in-flight cap is hit
+            async with mixed_semaphore:
+                return await next_request(scheduled_at, entry)
+
+        def replay_arrivals():
+            # Streamed from disk; shards take every shard_count-th entry
+            for i, entry in enumerate(read_trace(args.replay)):
+                if i % shard_count == shard_index:
+                    yield entry.offset / args.replay_speed, entry
+
+        def launch(scheduled_at, entry=None):
+            nonlocal op_count
+            task = asyncio.create_task(scheduled_request(scheduled_at, entry))
             mixed_workload_tasks.add(task)
             op_count += 1
             task.add_done_callback(on_done)
+            return task
 
-        # Prime the pool
-        for _ in range(MAX_CONCURRENT_REQUESTS):
-            await schedule_next()
+        async def search_step(rate):
+            # Warm up at the new rate, then measure the requests scheduled in the window;
+            # the step ends once they have all completed, so a backlog counts against it
+            window = LatencyStats()
+            last_done = None
 
-        # Continue scheduling as tasks finish, until time is up
-        while time.time() - start_time < args.duration:
-            if len(mixed_workload_tasks) < MAX_CONCURRENT_REQUESTS:
+            def record_window(task):
+                nonlocal last_done
+                try:
+                    record_result(window, task.result())
+                    last_done = time.perf_counter()
+                except Exception:
+                    pass
+
+            args.rate = rate
+            step_perf = time.perf_counter()
+            window_perf = step_perf + args.search_warmup
+            window_tasks = []
+            for offset in arrival_offsets(args.search_warmup + max(args.search_window, args.search_min_requests / rate)):
+                scheduled_at = step_perf + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = launch(scheduled_at)
+                if scheduled_at >= window_perf:
+                    task.add_done_callback(record_window)
+                    window_tasks.append(task)
+            if window_tasks:
+                await asyncio.gather(*window_tasks)
+            return window, (last_done - window_perf) if last_done is not None else 0.0
+
+        schedule_span = args.duration
+        if search_results is not None:
+            search = ThroughputSearch(args.search_start_rate, args.search_precision, args.search_max_steps)
+            while not search.done:
+                window, seconds = await search_step(search.rate)
+                row = search_step_row(search.steps + 1, search.rate, window, seconds)
+                search_results.append(row)
+                log(f"  Step {row['step']:>2}: {row['rate']:>9.1f} ops/s offered, {row['throughput']:>9.1f} ops/s ok, "
+                    f"p99 {row['p99_ms']:.2f} ms, errors {row['error_rate']:.2%} -> {'pass' if row['passed'] else 'FAIL'}")
+                search.record(row["passed"])
+        elif OPEN_LOOP:
+            # Send on the arrival schedule regardless of how many requests are still outstanding
+            arrivals = replay_arrivals() if REPLAY else ((offset, None) for offset in arrival_offsets(args.duration, shard_index, shard_count))
+            for offset, entry in arrivals:
+                if stopping:
+                    break
+                scheduled_at = start_perf + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                launch(scheduled_at, entry)
+            if REPLAY:
+                schedule_span = offset if op_count else 0
+        else:
+            # Prime the pool
+            for _ in range(mixed_concurrency):
                 await schedule_next()
-            else:
-                # Wait for any task to finish before scheduling more
-                done, _ = await asyncio.wait(mixed_workload_tasks, return_when=asyncio.FIRST_COMPLETED)
-                # Results are handled by add_done_callback
+
+            # Continue scheduling as tasks finish, until time is up
+            while time.time() - start_time < args.duration and not stopping:
+                if len(mixed_workload_tasks) < mixed_concurrency:
+                    await schedule_next()
+                else:
+                    # Wait for any task to finish before scheduling more
+                    done, _ = await asyncio.wait(mixed_workload_tasks, return_when=asyncio.FIRST_COMPLETED)
+                    # Results are handled by add_done_callback
+
+        send_end = time.time()
 
         # Wait for all in-flight tasks to finish
         if mixed_workload_tasks:
             await asyncio.gather(*mixed_workload_tasks)
+        if trace_writer is not None:
+            trace_writer.close()
+            log(f"Recorded {trace_writer.count} requests to {trace_writer.file.name}")
+
+        if watcher is not None:
+            watcher.cancel()
 
         mixed_end = time.time()
         mixed_duration = mixed_end - start_time
-        print(f"--- Mixed Workload Complete ({op_count} operations in {mixed_duration:.2f} seconds) ---")
-        print(f"Mixed workload throughput: {op_count/mixed_duration:.2f} ops/sec over {mixed_duration:.2f} seconds")
-
-        # Collect results
-        latencies.extend(mixed_results)
+        log(f"--- Mixed Workload Complete ({op_count} operations in {mixed_duration:.2f} seconds) ---")
+        log(f"Mixed workload throughput: {op_count/mixed_duration:.2f} ops/sec over {mixed_duration:.2f} seconds")
+        if OPEN_LOOP:
+            log(f"Intended rate: {op_count/schedule_span if schedule_span else 0:.2f} ops/sec, achieved: {completed/mixed_duration:.2f} ops/sec")
+            log(f"Late sends (> {args.late_threshold_ms:.1f} ms behind schedule): {late_count}/{op_count}, max lag {max_lag_ms:.2f} ms")
+        # Only windows that closed while requests were still being sent can be warmup
+        warmup_windows = 0
+        if tracker is not None:
+            warmup_windows = tracker.warmup_windows(int((send_end - start_time) / args.progress_interval))
+            warmup_ops = tracker.finish(warmup_windows)
+            tracker = None
+        if warmup_windows:
+            warmup_s = warmup_windows * args.progress_interval
+            op_count -= warmup_ops
+            mixed_duration -= warmup_s
+            log(f"Warmup: excluded the first {warmup_s:.1f} seconds ({warmup_ops} operations){' (detected)' if args.warmup == 'auto' else ''}")
+            if mixed_duration > 0:
+                log(f"Steady-state throughput: {op_count/mixed_duration:.2f} ops/sec over {mixed_duration:.2f} seconds")
+        stop_series()
 
     total_ops = (total_created if args.initial_load else 0) + op_count
     total_duration = (initial_duration if args.initial_load else 0) + mixed_duration
-    return latencies, (total_created if args.initial_load else 0), (initial_duration if args.initial_load else 0), op_count, mixed_duration, total_ops, total_duration
+    return stats, (total_created if args.initial_load else 0), (initial_duration if args.initial_load else 0), op_count, mixed_duration, total_ops, total_duration
 
 # --- Statistics Calculation ---
-def calculate_statistics(latencies_data, mixed_ops=0, mixed_duration=0):
-    stats = defaultdict(lambda: {"count": 0, "total_latency": 0, "latencies": [], "errors": 0, "success": 0})
-    for record in latencies_data:
-        op_type = record["type"]
-        stats[op_type]["count"] += 1
-        stats[op_type]["total_latency"] += record["latency_ms"]
-        stats[op_type]["latencies"].append(record["latency_ms"])
-        if isinstance(record["status"], int) and 200 <= record["status"] < 300:
-            stats[op_type]["success"] += 1
-        else:
-            stats[op_type]["errors"] += 1
-            if record["status"] == 409:
-                if "conflicts" not in stats[op_type]:
-                    stats[op_type]["conflicts"] = 0
-                stats[op_type]["conflicts"] += 1
-
+def calculate_statistics(stats, mixed_ops=0, mixed_duration=0):
     print("\n--- Test Results ---")
-    for op_type, data in stats.items():
+    for op_type in stats.op_types():
+        status_counts = stats.status_counts(op_type)
+        counters = stats.counters.get(op_type, {})
+        hist = stats.histogram([op_type])
         print(f"\nOperation Type: {op_type}")
-        print(f"  Total Requests: {data['count']}")
-        print(f"  Successful:     {data['success']}")
-        print(f"  Errors:         {data['errors']}")
-        if "conflicts" in data:
-            print(f"    Conflicts (409): {data['conflicts']}")
-        if data["latencies"]:
-            avg_latency = data["total_latency"] / data["count"]
-            min_latency = min(data["latencies"])
-            max_latency = max(data["latencies"])
-            sorted_latencies = sorted(data["latencies"])
-            p50_latency = sorted_latencies[int(len(sorted_latencies) * 0.5)]
-            p90_latency = sorted_latencies[int(len(sorted_latencies) * 0.9)]
-            p95_latency = sorted_latencies[int(len(sorted_latencies) * 0.95)]
-            p99_latency = sorted_latencies[int(len(sorted_latencies) * 0.99)]
-            print(f"  Avg Latency:    {avg_latency:.2f} ms")
-            print(f"  Min Latency:    {min_latency:.2f} ms")
-            print(f"  Max Latency:    {max_latency:.2f} ms")
-            print(f"  Median (P50):   {p50_latency:.2f} ms")
-            print(f"  P90 Latency:    {p90_latency:.2f} ms")
-            print(f"  P95 Latency:    {p95_latency:.2f} ms")
-            print(f"  P99 Latency:    {p99_latency:.2f} ms")
+        print(f"  Total Requests: {hist.count}")
+        print(f"  Successful:     {status_counts.get('2xx', 0)}")
+        print(f"  Errors:         {hist.count - status_counts.get('2xx', 0)}")
+        if "conflicts" in counters:
+            print(f"    Conflicts (409): {counters['conflicts']}")
+        if "records" in counters:
+            print(f"  Records Written: {counters['records']}")
+        if "records_read" in counters:
+            rate = f" ({counters['records_read'] / mixed_duration:.2f} records/sec)" if mixed_duration else ""
+            print(f"  Records Read:   {counters['records_read']}{rate}")
+        if len(status_counts) > 1:
+            print(f"  By Status:      {', '.join(f'{cls}={n}' for cls, n in sorted(status_counts.items()))}")
+        if "late" in counters:
+            print(f"  Late Sends:     {counters['late']}")
+        if hist.count:
+            print(f"  Avg Latency:    {hist.mean:.2f} ms")
+            print(f"  Min Latency:    {hist.min:.2f} ms")
+            print(f"  Max Latency:    {hist.max:.2f} ms")
+            print(f"  Median (P50):   {hist.percentile(50):.2f} ms")
+            print(f"  P90 Latency:    {hist.percentile(90):.2f} ms")
+            print(f"  P95 Latency:    {hist.percentile(95):.2f} ms")
+            print(f"  P99 Latency:    {hist.percentile(99):.2f} ms")
+            phases = stats.op_phases(op_type)
+            if phases:
+                print(f"  Phases:         {'count':>7}  p50 / p95 / p99 ms")
+                for phase in sorted(phases, key=TRACE_PHASES.index):
+                    phase_hist = stats.phase_histogram([op_type], phase)
+                    p50, p95, p99 = phase_hist.percentiles((50, 95, 99)).values()
+                    print(f"    {phase:<12}{phase_hist.count:>7}  {p50:.2f} / {p95:.2f} / {p99:.2f}")
         else:
             print("  No latency data recorded (all requests might have failed before sending).")
 
+    pool = stats.counters.get(POOL_COUNTERS)
+    if pool:
+        new = pool.get("new", 0)
+        reused = pool.get("reused", 0)
+        queued = pool.get("queued", 0)
+        print("\nConnection Pool:")
+        print(f"  New Connections:   {new}")
+        print(f"  Reused:            {reused}")
+        if new + reused:
+            print(f"  Reuse Ratio:       {reused / (new + reused):.2%}")
+        print(f"  Queued for Socket: {queued}")
+        if queued:
+            print(f"  Queue Wait:        {pool['queue_ms']:.2f} ms total, {pool['queue_ms'] / queued:.2f} ms avg")
+
     # Print summary for reads and writes
     for label, op_types in [
         ("READS", ["mixed_read"]),
-        ("WRITES", ["mixed_write", "initial_write"])
+        ("WRITES", ["mixed_write", "mixed_batch_write", "initial_write", "batch_initial_write"])
     ]:
-        latencies = []
-        for op in op_types:
-            latencies.extend(stats[op]["latencies"])
-        if latencies:
-            avg = sum(latencies) / len(latencies)
-            print(f"\n{label} - Avg Latency: {avg:.2f} ms, Min: {min(latencies):.2f} ms, Max: {max(latencies):.2f} ms")
+        hist = stats.histogram(op_types)
+        if hist.count:
+            print(f"\n{label} - Avg Latency: {hist.mean:.2f} ms, Min: {hist.min:.2f} ms, Max: {hist.max:.2f} ms")
         else:
             print(f"\n{label} - No latency data.")
 
@@ -314,25 +1212,216 @@ def calculate_statistics(latencies_data, mixed_ops=0, mixed_duration=0):
     if mixed_ops and mixed_duration:
         print(f"\nMixed workload throughput: {mixed_ops/mixed_duration:.2f} ops/sec over {mixed_duration:.2f} seconds")
 
+# --- Server Cache Stats ---
+CACHE_COUNTERS = ("hits", "misses", "evictions", "invalidations")
+
+async def fetch_cache_stats():
+    """Return the server's record-cache counters, or None if it has no /stats/cache endpoint."""
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=False)) as session:
+            async with session.get(CACHE_STATS_URL) as response:
+                if response.status != 200:
+                    return None
+                return await response.json()
+    except aiohttp.ClientError as e:
+        print(f"Could not fetch cache stats from {CACHE_STATS_URL}: {e}")
+        return None
+
+def cache_stats_delta(before, after):
+    delta = {name: after[name] - before[name] for name in CACHE_COUNTERS}
+    lookups = delta["hits"] + delta["misses"]
+    delta["hit_ratio"] = delta["hits"] / lookups if lookups else 0.0
+    delta["entries"] = after["entries"]
+    delta["bytes"] = after["bytes"]
+    return delta
+
+def print_cache_stats(delta):
+    print("\nServer Record Cache:")
+    print(f"  Hits:          {delta['hits']}")
+    print(f"  Misses:        {delta['misses']}")
+    print(f"  Hit Ratio:     {delta['hit_ratio']:.2%}")
+    print(f"  Evictions:     {delta['evictions']}")
+    print(f"  Invalidations: {delta['invalidations']}")
+    print(f"  Entries:       {delta['entries']} ({delta['bytes'] / 1024:.0f} KiB)")
+
+# --- Sharded Load Generation ---
+def run_shard(shard_index, shard_count, barrier, results, window_queue):
+    # Forked children inherit the parent's RNG state; reseed so shards don't send identical workloads
+    random.seed()
+    def emit_window(start_ms, window):
+        window_queue.put((shard_index, start_ms, window.to_dict()))
+    try:
+        stats, *totals = asyncio.run(run_test_scenario(shard_index, shard_count, barrier, emit_window if window_queue is not None else None))
+    except BaseException:
+        barrier.abort()
+        raise
+    results.put((shard_index, stats.to_dict(), totals))
+
+def run_sharded(workers, series_writer=None):
+    """
+    Fork one process per shard and merge what they send back into the same
+    tuple run_test_scenario returns. Shards start each phase together, so
+    merged durations are the slowest shard's and op counts are summed.
+    """
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    window_queue = ctx.Queue() if series_writer is not None else None
+    procs = [ctx.Process(target=run_shard, args=(i, workers, barrier, results, window_queue)) for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    if window_queue is not None:
+        collector = threading.Thread(target=collect_shard_windows, args=(window_queue, workers, series_writer), daemon=True)
+        collector.start()
+
+    shard_results = []
+    while len(shard_results) < workers:
+        try:
+            shard_results.append(results.get(timeout=1))
+        except queue.Empty:
+            if any(proc.exitcode not in (None, 0) for proc in procs):
+                barrier.abort()
+                for proc in procs:
+                    proc.terminate()
+                raise RuntimeError("A load-generator shard exited with an error")
+    for proc in procs:
+        proc.join()
+    if window_queue is not None:
+        window_queue.put(None)
+        collector.join()
+    if args.record_trace:
+        shard_traces = [f"{args.record_trace}.{i}" for i in range(workers)]
+        count = merge_traces(shard_traces, args.record_trace)
+        for path in shard_traces:
+            os.remove(path)
+        print(f"Merged {workers} shard traces into {args.record_trace} ({count} requests)")
+
+    stats = LatencyStats()
+    initial_ops = mixed_ops = 0
+    initial_duration = mixed_duration = 0
+    for _, shard_stats, (shard_initial_ops, shard_initial_duration, shard_mixed_ops, shard_mixed_duration, _, _) in sorted(shard_results, key=lambda r: r[0]):
+        stats.merge(LatencyStats.from_dict(shard_stats))
+        initial_ops += shard_initial_ops
+        initial_duration = max(initial_duration, shard_initial_duration)
+        mixed_ops += shard_mixed_ops
+        mixed_duration = max(mixed_duration, shard_mixed_duration)
+    return stats, initial_ops, initial_duration, mixed_ops, mixed_duration, initial_ops + mixed_ops, initial_duration + mixed_duration
+
+def merge_histogram_files(paths):
+    """Report the combined statistics of several runs saved with --save-histograms."""
+    merged = LatencyStats()
+    mixed_ops = 0
+    mixed_duration = 0
+    for path in paths:
+        stats, meta = LatencyStats.load(path)
+        merged.merge(stats)
+        mixed_ops += meta.get("mixed_ops", 0)
+        mixed_duration += meta.get("mixed_duration", 0)
+    print(f"\n=== Merged Results ({len(paths)} runs) ===")
+    calculate_statistics(merged, mixed_ops, mixed_duration)
+
+def run_test(series_writer=None):
+    if args.workers > 1:
+        print(f"Running {args.workers} load-generator processes")
+        return run_sharded(args.workers, series_writer)
+    emit_window = series_writer.write if series_writer is not None else None
+    return asyncio.run(run_test_scenario(emit_window=emit_window))
+
+def compare_group_commit():
+    """Run the same test with server-side group commit off and on and compare single-record writes."""
+    results = {}
+    for mode in ("off", "on"):
+        args.group_commit = mode
+        print(f"\n=== Test Run (group commit {mode}) ===")
+        results[mode] = run_test()
+        calculate_statistics(results[mode][0], results[mode][3], results[mode][4])
+    print("\n=== Group Commit Comparison ===")
+    print(f"{'mode':<6}{'initial w/s':>12}{'mixed w/s':>11}{'write p50':>11}{'write p95':>11}{'write p99':>11}{'read p99':>10}{'ops/s':>10}")
+    for mode, (stats, initial_ops, initial_duration, mixed_ops, mixed_duration, _, _) in results.items():
+        writes = stats.histogram(["mixed_write"])
+        initial = stats.histogram(["initial_write"])
+        reads = stats.histogram(["mixed_read"])
+        initial_rate = f"{initial.count / initial_duration:.2f}" if initial.count and initial_duration else "-"
+        write_rate = f"{writes.count / mixed_duration:.2f}" if mixed_duration else "-"
+        mixed_rate = f"{mixed_ops / mixed_duration:.2f}" if mixed_duration else "-"
+        print(f"{mode:<6}{initial_rate:>12}{write_rate:>11}"
+              f"{writes.percentile(50):>11.2f}{writes.percentile(95):>11.2f}{writes.percentile(99):>11.2f}"
+              f"{reads.percentile(99):>10.2f}{mixed_rate:>10}")
+
+def find_max_throughput():
+    """Run --slo-search and report the latency curve it measured and the throughput at the SLO."""
+    rows = []
+    series_writer = TimeSeriesWriter(args.timeseries, args.timeseries_interval) if args.timeseries else None
+    start = time.time()
+    stats, *_ = asyncio.run(run_test_scenario(emit_window=series_writer.write if series_writer else None, search_results=rows))
+    elapsed = time.time() - start
+    if series_writer is not None:
+        series_writer.close()
+        print(f"Time series written to {args.timeseries}")
+    print(f"\n=== SLO Search (p99 of {', '.join(args.slo_ops)} <= {args.slo_p99_ms:g} ms, errors <= {args.slo_error_rate:.1%}) ===")
+    print(f"{'rate':>10}{'ok ops/s':>11}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}  result")
+    for row in sorted(rows, key=lambda row: row["rate"]):
+        print(f"{row['rate']:>10.1f}{row['throughput']:>11.1f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['error_rate']:>9.2%}  {'pass' if row['passed'] else 'FAIL'}")
+    passing = [row for row in rows if row["passed"]]
+    if passing:
+        best = max(passing, key=lambda row: row["rate"])
+        print(f"\nSustainable throughput at SLO: {best['throughput']:.2f} ops/sec (offered {best['rate']:.1f} ops/sec, p99 {best['p99_ms']:.2f} ms)")
+        failing = [row["rate"] for row in rows if not row["passed"] and row["rate"] > best["rate"]]
+        if failing:
+            print(f"SLO boundary between {best['rate']:.1f} and {min(failing):.1f} ops/sec offered")
+        else:
+            print("No step failed; the boundary is above the highest rate tried (raise --search-max-steps)")
+    else:
+        print("\nNo step met the SLO")
+    print(f"Search took {len(rows)} steps in {elapsed:.2f} seconds")
+    if args.search_out:
+        with open(args.search_out, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SEARCH_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Search steps written to {args.search_out}")
+    if args.save_histograms:
+        stats.save(args.save_histograms, slo_search=rows)
+        print(f"Histograms saved to {args.save_histograms}")
+
 def main():
-    print(f"\n=== Test Run ===")
-    stats_list = []
-    stop_event = threading.Event()
-    attestation_start = time.time()
+    if args.merge_histograms:
+        merge_histogram_files(args.merge_histograms)
+        return
+    if args.slo_search:
+        find_max_throughput()
+        return
+    if args.compare_group_commit:
+        compare_group_commit()
+        return
+    print("\n=== Test Run ===")
+    series_writer = TimeSeriesWriter(args.timeseries, args.timeseries_interval) if args.timeseries else None
+    cache_before = asyncio.run(fetch_cache_stats()) if args.cache_stats else None
     start = time.time()
-    loop = asyncio.get_event_loop()
-    latencies, initial_ops, initial_duration, mixed_ops, mixed_duration, total_ops, total_duration = loop.run_until_complete(run_test_scenario())
+    stats, initial_ops, initial_duration, mixed_ops, mixed_duration, total_ops, total_duration = run_test(series_writer)
     end = time.time()
-    stop_event.set()
+    cache_delta = None
+    if cache_before is not None:
+        cache_after = asyncio.run(fetch_cache_stats())
+        if cache_after is not None:
+            cache_delta = cache_stats_delta(cache_before, cache_after)
+    elif args.cache_stats:
+        print("Server cache stats not available")
+    if series_writer is not None:
+        series_writer.close()
+        print(f"Time series written to {args.timeseries}")
     print(f"Run duration: {end-start:.2f} seconds")
-    calculate_statistics(latencies, mixed_ops, mixed_duration)
-    print(f"\nInitial write throughput: {initial_ops/initial_duration:.2f} ops/sec over {initial_duration:.2f} seconds")
+    calculate_statistics(stats, mixed_ops, mixed_duration)
+    if cache_delta is not None:
+        print_cache_stats(cache_delta)
+    if args.save_histograms:
+        stats.save(args.save_histograms, mixed_ops=mixed_ops, mixed_duration=mixed_duration, server_cache=cache_delta)
+        print(f"Histograms saved to {args.save_histograms}")
+    if initial_duration:
+        print(f"\nInitial write throughput: {initial_ops/initial_duration:.2f} ops/sec over {initial_duration:.2f} seconds")
     print(f"Mixed workload throughput: {mixed_ops/mixed_duration:.2f} ops/sec over {mixed_duration:.2f} seconds")
     print(f"Overall throughput: {total_ops/total_duration:.2f} ops/sec over {total_duration:.2f} seconds")
-    print("\nSampled container stats (timestamp, CPU%, Mem):")
-    for ts, stat in stats_list[:5]:
-        print(f"{ts}: {stat}")
-    print("...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Compact binary workload traces for test_speed.py --record-trace / --replay.
+
+A trace is an 8-byte header (TRACE_MAGIC plus a version byte) followed by one
+entry per request, in send order:
+
+  delta_us  uint32  microseconds since the previous entry's send time
+  op        uint8   index into OPS
+  key_len   uint16  length of key
+  size      uint32  request body bytes for write and batch; record limit for range; 0 otherwise
+  key       key_len bytes of UTF-8
+
+key is the user_id for read and write, the comma-separated user_ids for batch
+and multi, and "FROM:TO" for range. An empty key means the source did not
+know it (an access log has no request bodies), and replay draws keys from the
+--key-dist sampler instead. Traces are written and read a buffer at a time, so
+neither side holds the whole trace in memory.
+
+Convert an nginx access log (the default combined format) into a trace:
+    python workload_trace.py convert /var/log/nginx/access.log trace.bin
+Summarize a trace:
+    python workload_trace.py info trace.bin
+"""
+import argparse
+import heapq
+import re
+import struct
+import sys
+from collections import Counter, namedtuple
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+TRACE_MAGIC = b"FHTRACE"
+TRACE_VERSION = 1
+HEADER = TRACE_MAGIC + bytes([TRACE_VERSION])
+ENTRY = struct.Struct("<IBHI")
+OPS = ("read", "write", "batch", "multi", "range")
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+MAX_DELTA_US = 0xFFFFFFFF
+BUFFER_BYTES = 1 << 20
+
+TraceEntry = namedtuple("TraceEntry", ["offset", "op", "key", "size"])
+
+
+class TraceWriter:
+    """Append entries to a trace file; offsets are seconds from the start of the run."""
+
+    def __init__(self, path):
+        self.file = open(path, "wb", buffering=BUFFER_BYTES)
+        self.file.write(HEADER)
+        self.last_us = 0
+        self.count = 0
+
+    def write(self, offset, op, key="", size=0):
+        # Entries must be in send order; a request that reaches the writer a little
+        # after a later one (the in-flight cap) is stamped at the later one's time
+        offset_us = max(self.last_us, int(offset * 1e6))
+        delta_us = offset_us - self.last_us
+        if delta_us > MAX_DELTA_US:
+            raise ValueError(f"gap of {delta_us / 1e6:.0f} s between trace entries is too long to encode")
+        encoded = key.encode()
+        self.file.write(ENTRY.pack(delta_us, OP_CODES[op], len(encoded), size))
+        self.file.write(encoded)
+        self.last_us = offset_us
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_trace(path):
+    """Yield a TraceEntry per request, streaming from disk."""
+    with open(path, "rb", buffering=BUFFER_BYTES) as f:
+        header = f.read(len(HEADER))
+        if header[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+            raise ValueError(f"{path} is not a workload trace")
+        if header[len(TRACE_MAGIC):] != bytes([TRACE_VERSION]):
+            raise ValueError(f"{path} is trace version {header[-1]}, expected {TRACE_VERSION}")
+        offset_us = 0
+        while True:
+            fixed = f.read(ENTRY.size)
+            if not fixed:
+                return
+            if len(fixed) < ENTRY.size:
+                raise ValueError(f"{path} ends in the middle of an entry")
+            delta_us, op_code, key_len, size = ENTRY.unpack(fixed)
+            offset_us += delta_us
+            yield TraceEntry(offset_us / 1e6, OPS[op_code], f.read(key_len).decode(), size)
+
+
+def merge_traces(paths, out_path):
+    """Interleave several traces (e.g. one per load-generator shard) by send time."""
+    with TraceWriter(out_path) as writer:
+        for entry in heapq.merge(*(read_trace(path) for path in paths), key=lambda entry: entry.offset):
+            writer.write(*entry)
+        return writer.count
+
+
+# --- Access Log Conversion ---
+# nginx's default "combined" format
+COMBINED_LOG = re.compile(r'\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>\S+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) ')
+LOG_TIME_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+
+def log_request(method, path):
+    """Map an access-log request line onto (op, key, size), or None if it is not a records request."""
+    url = urlsplit(path)
+    if method == "POST" and url.path == "/records":
+        return "write", "", 0
+    if method == "POST" and url.path == "/records/multi-get":
+        return "multi", "", 0
+    if method == "GET" and url.path == "/records":
+        query = parse_qs(url.query)
+        low = query.get("from", ["0"])[0]
+        high = query.get("to", [""])[0]
+        return "range", f"{low}:{high}", int(query.get("limit", ["0"])[0])
+    if method == "GET" and url.path.startswith("/records/"):
+        return "read", url.path[len("/records/"):], 0
+    return None
+
+
+def convert_access_log(log_path, trace_path):
+    """
+    Write the records requests in an access log as a trace. The log only has
+    one-second timestamps, so the requests logged in each second are spread
+    evenly across it. Returns (entries written, lines skipped).
+    """
+    skipped = 0
+    start = None
+    second = None
+    pending = []
+
+    def flush(writer):
+        for i, (op, key, size) in enumerate(pending):
+            writer.write(second - start + i / len(pending), op, key, size)
+        pending.clear()
+
+    with open(log_path, errors="replace") as log, TraceWriter(trace_path) as writer:
+        for line in log:
+            match = COMBINED_LOG.match(line)
+            request = log_request(match["method"], match["path"]) if match else None
+            if request is None:
+                skipped += 1
+                continue
+            timestamp = datetime.strptime(match["time"], LOG_TIME_FORMAT).timestamp()
+            if start is None:
+                start = second = timestamp
+            # Lines logged out of order (nginx logs at completion) are folded into the current second
+            if timestamp > second:
+                flush(writer)
+                second = timestamp
+            pending.append(request)
+        if pending:
+            flush(writer)
+        return writer.count, skipped
+
+
+def trace_info(path):
+    ops = Counter()
+    keyless = 0
+    last = 0.0
+    for entry in read_trace(path):
+        ops[entry.op] += 1
+        keyless += not entry.key
+        last = entry.offset
+    total = sum(ops.values())
+    print(f"{path}: {total} requests over {last:.2f} s" + (f" ({total / last:.2f} ops/sec)" if last else ""))
+    for op in OPS:
+        if ops[op]:
+            print(f"  {op:<6} {ops[op]:>10}  {ops[op] / total:.1%}")
+    if keyless:
+        print(f"  {keyless} requests without keys; replay draws them from --key-dist")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Convert access logs to workload traces and summarize traces")
+    sub = p.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Convert an nginx combined-format access log into a trace")
+    convert.add_argument("log", help="Access log to read")
+    convert.add_argument("trace", help="Trace file to write")
+    info = sub.add_parser("info", help="Print a trace's length and operation mix")
+    info.add_argument("trace", help="Trace file to read")
+    args = p.parse_args()
+    if args.command == "convert":
+        written, skipped = convert_access_log(args.log, args.trace)
+        print(f"Wrote {written} requests to {args.trace} ({skipped} lines skipped)")
+        trace_info(args.trace)
+    else:
+        try:
+            trace_info(args.trace)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()